@@ -0,0 +1,73 @@
+"""
+Login event-loop latency benchmark
+
+Runs a burst of concurrent password verifications (the CPU-bound part of
+/api/auth/login) while a probe task measures how late the event loop wakes it
+up. Compares verifying inline (blocking) with the password executor.
+
+Usage: python benchmark_login.py [--logins 20] [--rounds 12]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+import utils.security as security
+
+PROBE_INTERVAL = 0.005
+
+async def probe(lags: list, stop: asyncio.Event):
+    """Sleep in short steps and record how much later than requested we wake up"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+async def login_blocking(password: str, password_hash: str):
+    await asyncio.sleep(0)  # stands in for the user lookup
+    assert security.verify_password(password, password_hash)
+
+async def login_offloaded(password: str, password_hash: str):
+    await asyncio.sleep(0)  # stands in for the user lookup
+    assert await security.verify_password_async(password, password_hash)
+
+async def run_scenario(name: str, login, logins: int, password: str, password_hash: str):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 4)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[login(password, password_hash) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    
+    stop.set()
+    await probe_task
+    
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{name:<10} logins={logins:<4} total={elapsed * 1000:8.1f} ms  "
+        f"loop lag p50={statistics.median(lags):7.1f} ms  p99={p99:7.1f} ms  max={lags[-1]:7.1f} ms  "
+        f"probe wakeups={len(lags)}"
+    )
+
+async def main(logins: int, rounds: int):
+    # Same scheme as the app, with configurable cost so the benchmark stays quick
+    security.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    password = "benchmark-password"
+    password_hash = security.pwd_context.hash(password)
+    
+    print(f"bcrypt rounds={rounds}, executor workers={security.config.PASSWORD_HASH_WORKERS}")
+    await run_scenario("blocking", login_blocking, logins, password, password_hash)
+    await run_scenario("offloaded", login_offloaded, logins, password, password_hash)
+    print(f"executor stats: {security.get_password_hash_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
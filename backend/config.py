@@ -14,11 +14,51 @@ class Config:
     
     # Security
     BCRYPT_ROUNDS = 12
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
     
     # CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
     
     # Audit
-    AUDIT_RETENTION_DAYS = 365
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', '365'))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '100'))
+    AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', '0.5'))
+    AUDIT_QUEUE_MAX_SIZE = int(os.environ.get('AUDIT_QUEUE_MAX_SIZE', '10000'))
+    AUDIT_DRAIN_TIMEOUT_SECONDS = 10
+    AUDIT_WRITE_MAX_ATTEMPTS = int(os.environ.get('AUDIT_WRITE_MAX_ATTEMPTS', '10'))
     
+    # Audit retention: with AUDIT_ARCHIVE_DIR set, expired entries are first rolled into
+    # gzipped NDJSON files per month; the TTL index then only catches what the archiver missed
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', '')
+    AUDIT_ARCHIVE_INTERVAL_HOURS = int(os.environ.get('AUDIT_ARCHIVE_INTERVAL_HOURS', '6'))
+    AUDIT_ARCHIVE_BATCH_SIZE = 1000
+    AUDIT_ARCHIVE_GRACE_DAYS = 30
+    
+    # Principal cache (authenticated users). Invalidations reach other workers through
+    # SOCKETIO_MESSAGE_QUEUE; without one a worker may serve a stale user for up to the TTL
+    PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '30'))
+    PRINCIPAL_CACHE_MAX_SIZE = int(os.environ.get('PRINCIPAL_CACHE_MAX_SIZE', '1024'))
+    
+    # Admin dashboard statistics snapshot
+    ADMIN_STATS_CACHE_TTL_SECONDS = int(os.environ.get('ADMIN_STATS_CACHE_TTL_SECONDS', '30'))
+    
+    # Weekly rollover: next week's tables are created this long before Monday 00:00 UTC
+    WEEK_ROLLOVER_ENABLED = os.environ.get('WEEK_ROLLOVER_ENABLED', 'true').lower() == 'true'
+    WEEK_ROLLOVER_LEAD_HOURS = int(os.environ.get('WEEK_ROLLOVER_LEAD_HOURS', '6'))
+    WEEK_ROLLOVER_BATCH_SIZE = 500
+    
+    # Socket.IO fan-out between workers: redis://..., amqp://... or local:// (in-process, for tests);
+    # empty keeps a single-process server
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'socketio')
+    
+    # Socket.IO: table updates for the same week within this window are sent as one event
+    SOCKET_COALESCE_WINDOW_MS = int(os.environ.get('SOCKET_COALESCE_WINDOW_MS', '150'))
+    
+    # Faction registry: minimum delay between reloads triggered by unknown codes/ids
+    FACTION_REGISTRY_RELOAD_INTERVAL_SECONDS = int(os.environ.get('FACTION_REGISTRY_RELOAD_INTERVAL_SECONDS', '10'))
+    
+    # Notifications written per insert_many when notifying many users at once
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '500'))
+
 config = Config()
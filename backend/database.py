@@ -1,15 +1,25 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 from config import config
+from datetime import timezone
+from pymongo.errors import OperationFailure
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Server error codes for an existing index with the same keys/name but other options
+INDEX_CONFLICT_CODES = (85, 86)
+
 class Database:
     client: AsyncIOMotorClient = None
     db = None
 
+def create_client() -> AsyncIOMotorClient:
+    """Client storing datetimes as BSON dates and reading them back as aware UTC datetimes"""
+    return AsyncIOMotorClient(config.MONGO_URL, tz_aware=True, tzinfo=timezone.utc)
+
 async def connect_db():
-    Database.client = AsyncIOMotorClient(config.MONGO_URL)
+    Database.client = create_client()
     Database.db = Database.client[config.DB_NAME]
     logger.info("Connected to MongoDB")
     
@@ -21,46 +31,198 @@ async def close_db():
         Database.client.close()
         logger.info("Closed MongoDB connection")
 
+def audit_ttl_seconds() -> int:
+    """expireAfterSeconds of the audit_logs TTL index.
+    
+    Without archiving entries expire after AUDIT_RETENTION_DAYS. With it, the
+    archiver removes them at that age and the TTL index waits
+    AUDIT_ARCHIVE_GRACE_DAYS longer, so entries are never dropped unarchived
+    while the archiver is briefly down.
+    """
+    days = config.AUDIT_RETENTION_DAYS
+    if config.AUDIT_ARCHIVE_DIR:
+        days += config.AUDIT_ARCHIVE_GRACE_DAYS
+    return days * 86400
+
+# Index manifest: {collection: [(keys, options)]}. keys is a field name or a
+# list of fields / (field, direction) pairs; every route lookup must be covered.
+DESCENDING = -1
+UNIQUE = {"unique": True}
+
+INDEX_MANIFEST = {
+    "users": [
+        ("id", UNIQUE),
+        ("email", UNIQUE),
+        ("nickname", {}),
+        ("role", {}),
+        ("faction", {}),
+        ("department_id", {}),
+        # Admin statistics count active users only
+        ("is_active", {}),
+    ],
+    "factions": [
+        ("id", UNIQUE),
+        ("code", UNIQUE),
+    ],
+    "departments": [
+        ("id", UNIQUE),
+        (["faction_id", "name"], {}),
+    ],
+    "table_structures": [
+        ("department_id", UNIQUE),
+    ],
+    # Newest first: serves the per-department list and the carry-forward lookup
+    # (sorted by department_id, week_start desc) without an in-memory sort
+    "weeks": [
+        ("id", UNIQUE),
+        (["department_id", ("week_start", DESCENDING)], UNIQUE),
+        ("week_start", {}),
+        ("is_current", {}),
+    ],
+    "table_data": [
+        ("week_id", UNIQUE),
+        ("department_id", {}),
+    ],
+    "lecture_topics": [
+        ("id", UNIQUE),
+        (["faction_id", "order"], {}),
+    ],
+    "training_topics": [
+        ("id", UNIQUE),
+        (["faction_id", "order"], {}),
+    ],
+    "department_lecture_topics": [
+        ("id", UNIQUE),
+        (["department_id", "order"], {}),
+    ],
+    "department_training_topics": [
+        ("id", UNIQUE),
+        (["department_id", "order"], {}),
+    ],
+    "senior_staff": [
+        ("id", UNIQUE),
+        ("faction_id", {}),
+    ],
+    # Newest first with id as tie-breaker: the keyset pagination order of each filter
+    "audit_logs": [
+        ("timestamp", {"expireAfterSeconds": audit_ttl_seconds()}),
+        ([("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+        (["user_id", ("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+        (["resource_type", ("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+        (["action", ("timestamp", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "notifications": [
+        ("id", UNIQUE),
+        (["user_id", ("created_at", DESCENDING)], {}),
+        (["user_id", "read", ("created_at", DESCENDING)], {}),
+    ],
+    "notification_counters": [
+        ("user_id", UNIQUE),
+    ],
+    "refresh_tokens": [
+        ("token", UNIQUE),
+        ("user_id", {}),
+        ("expires_at", {}),
+    ],
+}
+
+def normalize_keys(keys) -> list:
+    """Index keys as a list of (field, direction) pairs"""
+    if isinstance(keys, str):
+        keys = [keys]
+    return [(key, 1) if isinstance(key, str) else tuple(key) for key in keys]
+
 async def create_indexes():
-    """Create necessary database indexes for performance"""
+    """Create the indexes of INDEX_MANIFEST, all collections in parallel"""
     db = Database.db
     
-    # Users indexes
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("role")
-    await db.users.create_index("faction")
-    
-    # Departments indexes
-    await db.departments.create_index("faction_id")
-    await db.departments.create_index(["faction_id", "name"])
-    
-    # Table structures indexes
-    await db.table_structures.create_index("department_id", unique=True)
-    
-    # Weeks indexes
-    await db.weeks.create_index("department_id")
-    await db.weeks.create_index(["department_id", "week_start"])
-    await db.weeks.create_index("is_current")
+    await asyncio.gather(*(
+        ensure_index(db[collection], normalize_keys(keys), **options)
+        for collection, indexes in INDEX_MANIFEST.items()
+        for keys, options in indexes
+    ))
+    logger.info("Database indexes created")
     
-    # Table data indexes
-    await db.table_data.create_index("week_id")
-    await db.table_data.create_index("department_id")
+    drift = await verify_indexes(usage=False)
+    for collection, report in drift.items():
+        for name in report['extra']:
+            logger.warning(f"Index {collection}.{name} is not in the index manifest")
+        for keys in report['missing']:
+            logger.error(f"Index {collection} {keys} from the manifest is missing")
+
+async def verify_indexes(usage: bool = True) -> dict:
+    """Compare the database with INDEX_MANIFEST.
     
-    # Audit logs indexes
-    await db.audit_logs.create_index("user_id")
-    await db.audit_logs.create_index("timestamp")
-    await db.audit_logs.create_index("resource_type")
+    Returns {collection: {"missing": [keys], "extra": [names], "unused": [names]}}
+    for collections that differ. "unused" lists indexes with no accesses
+    since the server started ($indexStats) and is only filled when usage=True.
+    """
+    db = Database.db
     
-    # Notifications indexes
-    await db.notifications.create_index("user_id")
-    await db.notifications.create_index(["user_id", "read"])
+    async def check(collection: str, indexes: list) -> dict:
+        existing = await db[collection].index_information()
+        expected = [normalize_keys(keys) for keys, _ in indexes]
+        present = {
+            name: [tuple(pair) for pair in info['key']]
+            for name, info in existing.items()
+            if name != "_id_"
+        }
+        
+        report = {
+            "missing": [keys for keys in expected if keys not in present.values()],
+            "extra": [name for name, keys in present.items() if keys not in expected],
+            "unused": []
+        }
+        if usage and present:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+            report["unused"] = sorted(
+                stat['name'] for stat in stats
+                if stat['name'] != "_id_" and stat['accesses']['ops'] == 0
+            )
+        return report
     
-    # Refresh tokens indexes
-    await db.refresh_tokens.create_index("token", unique=True)
-    await db.refresh_tokens.create_index("user_id")
-    await db.refresh_tokens.create_index("expires_at")
+    collections = list(INDEX_MANIFEST)
+    reports = await asyncio.gather(*(check(collection, INDEX_MANIFEST[collection]) for collection in collections))
+    return {
+        collection: report
+        for collection, report in zip(collections, reports)
+        if any(report.values())
+    }
+
+async def ensure_index(collection, keys, **options):
+    """Create an index, replacing an existing one on the same keys whose options differ.
     
-    logger.info("Database indexes created")
+    A TTL index whose expireAfterSeconds is the only difference is updated in
+    place with collMod instead of being rebuilt.
+    """
+    try:
+        await collection.create_index(keys, **options)
+    except OperationFailure as e:
+        if e.code == 11000:
+            # Existing duplicates must be cleaned up by hand before the index can be built
+            logger.error(f"Cannot create unique index {keys} on {collection.name}: {e}")
+            return
+        if e.code not in INDEX_CONFLICT_CODES:
+            raise
+        
+        existing = await collection.index_information()
+        key_spec = normalize_keys(keys)
+        for name, info in existing.items():
+            if name == "_id_" or [tuple(pair) for pair in info['key']] != key_spec:
+                continue
+            
+            other_options = set(info) - {"v", "key", "ns", "expireAfterSeconds"}
+            if set(options) == {"expireAfterSeconds"} and "expireAfterSeconds" in info and not other_options:
+                logger.info(f"Changing expireAfterSeconds of index {name} on {collection.name} to {options['expireAfterSeconds']}")
+                await collection.database.command(
+                    "collMod", collection.name,
+                    index={"name": name, "expireAfterSeconds": options["expireAfterSeconds"]}
+                )
+                return
+            
+            logger.info(f"Replacing index {name} on {collection.name}")
+            await collection.drop_index(name)
+        await collection.create_index(keys, **options)
 
 def get_db():
     return Database.db
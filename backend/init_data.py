@@ -4,7 +4,7 @@ Initialize database with default data:
 - All 8 factions
 """
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+from database import create_client
 from config import config
 from utils.security import hash_password
 from models import RoleEnum, FactionEnum
@@ -24,7 +24,7 @@ FACTIONS_DATA = [
 
 async def init_database():
     """Initialize database with default data"""
-    client = AsyncIOMotorClient(config.MONGO_URL)
+    client = create_client()
     db = client[config.DB_NAME]
     
     print("🚀 Initializing database...")
@@ -39,7 +39,7 @@ async def init_database():
                 "code": faction_data["code"],
                 "name": faction_data["name"],
                 "description": faction_data["description"],
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc)
             }
             await db.factions.insert_one(faction_doc)
             print(f"✅ Created faction: {faction_data['name']}")
@@ -61,7 +61,7 @@ async def init_database():
             "department_id": None,
             "is_active": True,
             "two_fa_enabled": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(admin_doc)
         print("✅ Super admin created")
@@ -83,7 +83,7 @@ async def init_database():
                 "name": "Отдел контрразведки",
                 "head_user_id": None,
                 "deputy_user_ids": [],
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc)
             }
             await db.departments.insert_one(dept_doc)
             
@@ -105,8 +105,8 @@ async def init_database():
                 "id": str(uuid.uuid4()),
                 "department_id": dept_doc['id'],
                 "columns": default_columns,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "created_at": datetime.now(timezone.utc),
+                "updated_at": datetime.now(timezone.utc)
             }
             await db.table_structures.insert_one(struct_doc)
             
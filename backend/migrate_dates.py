@@ -0,0 +1,92 @@
+"""
+ISO string to BSON date migration
+
+Timestamps used to be stored as ISO 8601 strings. The application now writes
+native BSON dates and queries them as datetimes (week lookups, audit log and
+login ranges, TTL indexes), so existing string values must be converted before
+the new code serves traffic. The migration is idempotent: only fields that are
+still strings are rewritten.
+
+Usage: python migrate_dates.py [--dry-run] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from config import config
+from database import create_client
+
+# Datetime fields per collection
+DATE_FIELDS = {
+    "users": ["created_at", "updated_at"],
+    "deleted_users": ["created_at", "updated_at", "deleted_at"],
+    "factions": ["created_at"],
+    "departments": ["created_at", "updated_at"],
+    "table_structures": ["created_at", "updated_at"],
+    "weeks": ["week_start", "week_end", "created_at"],
+    "table_data": ["created_at", "updated_at"],
+    "lecture_topics": ["created_at"],
+    "training_topics": ["created_at"],
+    "department_lecture_topics": ["created_at"],
+    "department_training_topics": ["created_at"],
+    "senior_staff": ["created_at", "updated_at"],
+    "audit_logs": ["timestamp"],
+    "notifications": ["created_at"],
+    "refresh_tokens": ["expires_at", "created_at"],
+}
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a stored ISO string; naive values were written in UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+async def migrate_collection(db, collection: str, fields: list, batch_size: int, dry_run: bool) -> int:
+    """Convert string values of `fields` in one collection, returns the number of documents changed"""
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    
+    changed = 0
+    requests = []
+    async for doc in db[collection].find(query, projection):
+        update = {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str):
+                try:
+                    update[field] = parse_timestamp(value)
+                except ValueError:
+                    print(f"  {collection} {doc['_id']}: cannot parse {field}={value!r}, left as is")
+        if not update:
+            continue
+        
+        changed += 1
+        requests.append(UpdateOne({"_id": doc['_id']}, {"$set": update}))
+        if len(requests) >= batch_size:
+            if not dry_run:
+                await db[collection].bulk_write(requests, ordered=False)
+            requests = []
+    
+    if requests and not dry_run:
+        await db[collection].bulk_write(requests, ordered=False)
+    return changed
+
+async def main(args):
+    client = create_client()
+    db = client[config.DB_NAME]
+    try:
+        for collection, fields in DATE_FIELDS.items():
+            changed = await migrate_collection(db, collection, fields, args.batch_size, args.dry_run)
+            verb = "would convert" if args.dry_run else "converted"
+            print(f"{collection}: {verb} {changed} document(s)")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only count the documents to convert")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
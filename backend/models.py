@@ -201,12 +201,24 @@ class TableData(BaseModel):
     week_id: str
     department_id: str
     rows: List[TableRowData]
+    version: int = 0  # Incremented on every write (optimistic concurrency)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class TableDataUpdate(BaseModel):
     rows: List[TableRowData]
 
+class TableDataOperation(BaseModel):
+    op: str  # 'set_cell', 'add_row', 'remove_row', 'rename_employee'
+    employee_name: Optional[str] = None  # Target row (set_cell, remove_row, rename_employee)
+    column: Optional[str] = None  # set_cell
+    value: Any = None  # set_cell
+    new_name: Optional[str] = None  # rename_employee
+    row: Optional[TableRowData] = None  # add_row
+
+class TableDataPatch(BaseModel):
+    operations: List[TableDataOperation]
+
 class LectureTopic(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -259,6 +271,7 @@ class SeniorStaffTable(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     faction_id: str
     rows: List[SeniorStaffRow]
+    version: int = 0  # Incremented on every write (optimistic concurrency)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
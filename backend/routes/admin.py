@@ -8,12 +8,14 @@ from models import (
     UserResponse, AdminUserCreate, UserUpdate, RoleEnum, FactionEnum
 )
 from routes.auth import get_current_user
-from utils.security import hash_password
+from utils.security import hash_password_async, get_password_hash_stats
 from utils.permissions import Permissions
-from utils.audit import log_action
-
-# Alias for consistency
-get_password_hash = hash_password
+from utils.audit import log_action, audit_writer
+from utils.retention import audit_archiver
+from utils.factions import faction_registry
+from utils.principals import invalidate_principal, get_principal_cache_stats
+from websocket_server import table_update_emitter, get_connection_stats
+from utils.stats import get_admin_stats_snapshot, invalidate_admin_stats, stats_cache
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -76,11 +78,6 @@ async def get_all_users(
     
     users = await db.users.find(query, {'_id': 0, 'password_hash': 0}).to_list(1000)
     
-    # Convert datetime strings to datetime objects
-    for user in users:
-        if isinstance(user.get('created_at'), str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
-    
     return users
 
 @router.get("/users/{user_id}", response_model=UserResponse)
@@ -97,9 +94,6 @@ async def get_user(user_id: str, current_user: dict = Depends(get_current_user))
             detail="Пользователь не найден"
         )
     
-    if isinstance(user.get('created_at'), str):
-        user['created_at'] = datetime.fromisoformat(user['created_at'].replace('Z', '+00:00'))
-    
     return user
 
 @router.post("/users", response_model=UserResponse)
@@ -147,7 +141,7 @@ async def create_user(
     user_doc = {
         'id': str(uuid.uuid4()),
         'email': user_data.email,
-        'password_hash': get_password_hash(user_data.password),
+        'password_hash': await hash_password_async(user_data.password),
         'full_name': user_data.full_name,
         'nickname': user_data.nickname,
         'position': user_data.position,
@@ -158,11 +152,12 @@ async def create_user(
         'is_active': True,
         'two_fa_enabled': False,
         'two_fa_secret': None,
-        'created_at': now.isoformat(),
+        'created_at': now,
         'created_by': current_user['id']
     }
     
     await db.users.insert_one(user_doc)
+    invalidate_admin_stats()
     
     # Log action
     await log_action(
@@ -224,9 +219,11 @@ async def update_user(
             detail="Нет данных для обновления"
         )
     
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
     await db.users.update_one({'id': user_id}, {'$set': update_data})
+    await invalidate_principal(user_id)
+    invalidate_admin_stats()
     
     # Log action
     await log_action(
@@ -242,8 +239,6 @@ async def update_user(
     
     # Return updated user
     updated_user = await db.users.find_one({'id': user_id}, {'_id': 0, 'password_hash': 0, 'two_fa_secret': 0})
-    if isinstance(updated_user.get('created_at'), str):
-        updated_user['created_at'] = datetime.fromisoformat(updated_user['created_at'].replace('Z', '+00:00'))
     
     return updated_user
 
@@ -285,13 +280,15 @@ async def delete_user(
         {'id': user_id},
         {'$set': {
             'is_active': False,
-            'deleted_at': datetime.now(timezone.utc).isoformat(),
+            'deleted_at': datetime.now(timezone.utc),
             'deleted_by': current_user['id']
         }}
     )
+    await invalidate_principal(user_id)
+    invalidate_admin_stats()
     
     # Store in deleted_users for recovery
-    user['deleted_at'] = datetime.now(timezone.utc).isoformat()
+    user['deleted_at'] = datetime.now(timezone.utc)
     user['deleted_by'] = current_user['id']
     await db.deleted_users.insert_one(user)
     
@@ -330,6 +327,8 @@ async def activate_user(
         {'id': user_id},
         {'$set': {'is_active': True}, '$unset': {'deleted_at': '', 'deleted_by': ''}}
     )
+    await invalidate_principal(user_id)
+    invalidate_admin_stats()
     
     # Log action
     await log_action(
@@ -384,7 +383,7 @@ async def get_departments_list(
     query = {}
     if faction:
         # Get faction ID
-        faction_doc = await db.factions.find_one({'code': faction})
+        faction_doc = await faction_registry.get_by_code(faction)
         if faction_doc:
             query['faction_id'] = faction_doc['id']
     
@@ -397,41 +396,41 @@ async def get_admin_stats(current_user: dict = Depends(get_current_user)):
     """Get admin dashboard statistics"""
     check_admin_access(current_user)
     
-    db = get_db()
-    
-    total_users = await db.users.count_documents({'is_active': True})
-    total_departments = await db.departments.count_documents({})
-    total_factions = await db.factions.count_documents({})
-    
-    # Users by role
-    users_by_role = {}
-    for role in RoleEnum:
-        count = await db.users.count_documents({'role': role.value, 'is_active': True})
-        if count > 0:
-            users_by_role[ROLE_NAMES.get(role.value, role.value)] = count
+    stats = await get_admin_stats_snapshot()
     
-    # Users by faction
-    users_by_faction = {}
-    for faction in FactionEnum:
-        count = await db.users.count_documents({'faction': faction.value, 'is_active': True})
-        if count > 0:
-            users_by_faction[FACTION_NAMES.get(faction.value, faction.value)] = count
-    
-    # Recent logins (last 24 hours)
-    from datetime import timedelta
-    day_ago = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
-    recent_logins = await db.audit_logs.count_documents({
-        'action': 'user_login',
-        'timestamp': {'$gte': day_ago}
-    })
+    # Display names in enum order, skipping empty groups
+    users_by_role = {
+        ROLE_NAMES.get(role.value, role.value): stats["users_by_role"][role.value]
+        for role in RoleEnum if stats["users_by_role"].get(role.value)
+    }
+    users_by_faction = {
+        FACTION_NAMES.get(faction.value, faction.value): stats["users_by_faction"][faction.value]
+        for faction in FactionEnum if stats["users_by_faction"].get(faction.value)
+    }
     
     return {
-        "total_users": total_users,
-        "total_departments": total_departments,
-        "total_factions": total_factions,
+        "total_users": stats["total_users"],
+        "total_departments": stats["total_departments"],
+        "total_factions": stats["total_factions"],
         "users_by_role": users_by_role,
         "users_by_faction": users_by_faction,
-        "recent_logins_24h": recent_logins
+        "recent_logins_24h": stats["recent_logins_24h"]
+    }
+
+@router.get("/metrics")
+async def get_runtime_metrics(current_user: dict = Depends(get_current_user)):
+    """Get in-process cache and runtime counters for this worker"""
+    check_admin_access(current_user)
+    
+    return {
+        "principal_cache": get_principal_cache_stats(),
+        "admin_stats_cache": stats_cache.stats(),
+        "faction_registry": faction_registry.stats(),
+        "password_hashing": get_password_hash_stats(),
+        "table_update_broadcasts": table_update_emitter.stats(),
+        "socket_connections": get_connection_stats(),
+        "audit_writer": audit_writer.stats(),
+        "audit_archiver": audit_archiver.stats()
     }
 
 @router.post("/impersonate/{user_id}")
@@ -473,9 +472,6 @@ async def impersonate_user(
     access_token = create_access_token(data={"user_id": target_user['id'], "impersonated_by": current_user['id']})
     refresh_token = create_refresh_token(data={"user_id": target_user['id']})
     
-    if isinstance(target_user.get('created_at'), str):
-        target_user['created_at'] = datetime.fromisoformat(target_user['created_at'].replace('Z', '+00:00'))
-    
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -1,24 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from routes.auth import get_current_user
 from database import get_db
 from models import AuditLogResponse
 from utils.permissions import Permissions
 from utils.audit import get_audit_logs
+from utils.retention import list_archives, read_archive
+from config import config
 from datetime import datetime
 from typing import List, Optional
+import asyncio
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
 @router.get("/logs", response_model=List[AuditLogResponse])
 async def get_logs(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     user_id: Optional[str] = None,
     resource_type: Optional[str] = None,
     action: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get audit logs (admin only)"""
+    """Get audit logs (admin only); the next page is requested with the X-Next-Cursor header value"""
     # Check permission
     if not Permissions.can_view_audit_logs(current_user['role']):
         raise HTTPException(
@@ -26,12 +33,78 @@ async def get_logs(
             detail="You don't have permission to view audit logs"
         )
     
-    logs = await get_audit_logs(
-        skip=skip,
-        limit=limit,
-        user_id=user_id,
-        resource_type=resource_type,
-        action=action
-    )
+    try:
+        logs, next_cursor = await get_audit_logs(
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            resource_type=resource_type,
+            action=action,
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return logs
+
+def check_archive_access(current_user: dict):
+    """Archives are developer-only and need AUDIT_ARCHIVE_DIR"""
+    if current_user['role'] != 'developer':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only developers can read audit archives"
+        )
+    if not config.AUDIT_ARCHIVE_DIR:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audit archiving is disabled"
+        )
+
+@router.get("/archives")
+async def get_archives(current_user: dict = Depends(get_current_user)):
+    """List archived months of audit logs (developer only)"""
+    check_archive_access(current_user)
+    return await asyncio.to_thread(list_archives, config.AUDIT_ARCHIVE_DIR)
+
+@router.get("/archives/{month}", response_model=List[AuditLogResponse])
+async def get_archived_logs(
+    month: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    user_id: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    action: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get archived audit logs of a month (YYYY-MM), oldest first (developer only)"""
+    check_archive_access(current_user)
+    
+    try:
+        return await asyncio.to_thread(
+            read_archive,
+            config.AUDIT_ARCHIVE_DIR,
+            month,
+            skip=skip,
+            limit=limit,
+            user_id=user_id,
+            resource_type=resource_type,
+            action=action
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No archive for {month}"
+        )
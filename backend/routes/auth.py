@@ -2,9 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models import UserCreate, UserLogin, TokenResponse, UserResponse, TwoFASetupResponse
 from database import get_db
-from utils.security import hash_password, verify_password, create_access_token, create_refresh_token, decode_token, generate_backup_codes
+from utils.security import hash_password_async, verify_password_async, create_access_token, create_refresh_token, decode_token, generate_backup_codes
 from utils.permissions import Permissions
 from utils.audit import log_action
+from utils.principals import get_principal, invalidate_principal
+from utils.stats import invalidate_admin_stats
 from datetime import datetime, timedelta, timezone
 from config import config
 import pyotp
@@ -34,8 +36,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token payload"
         )
     
-    db = get_db()
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await get_principal(user_id)
     
     if not user:
         raise HTTPException(
@@ -49,10 +50,6 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User account is disabled"
         )
     
-    # Convert datetime strings if needed
-    if isinstance(user.get('created_at'), str):
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-    
     return user
 
 @router.post("/register", response_model=UserResponse)
@@ -69,14 +66,14 @@ async def register(user_data: UserCreate, request: Request):
         )
     
     # Hash password
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     
     # Create user document
     user_dict = user_data.model_dump(exclude={'password'})
     user_dict['password_hash'] = hashed_password
     user_dict['is_active'] = True
     user_dict['two_fa_enabled'] = False
-    user_dict['created_at'] = datetime.now(timezone.utc).isoformat()
+    user_dict['created_at'] = datetime.now(timezone.utc)
     
     # Generate unique ID
     from models import UserBase
@@ -85,6 +82,7 @@ async def register(user_data: UserCreate, request: Request):
     
     # Insert user
     await db.users.insert_one(user_dict)
+    invalidate_admin_stats()
     
     # Log action
     await log_action(
@@ -98,8 +96,6 @@ async def register(user_data: UserCreate, request: Request):
     
     # Return user without sensitive data
     user_response = {k: v for k, v in user_dict.items() if k not in ['password_hash', 'two_fa_secret', 'backup_codes']}
-    if isinstance(user_response['created_at'], str):
-        user_response['created_at'] = datetime.fromisoformat(user_response['created_at'])
     
     return user_response
 
@@ -117,7 +113,7 @@ async def login(credentials: UserLogin, request: Request):
         )
     
     # Verify password
-    if not verify_password(credentials.password, user['password_hash']):
+    if not await verify_password_async(credentials.password, user['password_hash']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -153,6 +149,7 @@ async def login(credentials: UserLogin, request: Request):
                     {"id": user['id']},
                     {"$pull": {"backup_codes": credentials.otp_code}}
                 )
+                await invalidate_principal(user['id'])
     
     # Create tokens
     access_token = create_access_token(
@@ -164,8 +161,8 @@ async def login(credentials: UserLogin, request: Request):
     refresh_token_doc = {
         "token": refresh_token,
         "user_id": user['id'],
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS),
+        "created_at": datetime.now(timezone.utc)
     }
     await db.refresh_tokens.insert_one(refresh_token_doc)
     
@@ -181,8 +178,6 @@ async def login(credentials: UserLogin, request: Request):
     
     # Prepare user response
     user_response = {k: v for k, v in user.items() if k not in ['password_hash', 'two_fa_secret', 'backup_codes']}
-    if isinstance(user_response['created_at'], str):
-        user_response['created_at'] = datetime.fromisoformat(user_response['created_at'])
     
     return {
         "access_token": access_token,
@@ -205,8 +200,7 @@ async def refresh_access_token(refresh_token: str):
         )
     
     # Check expiration
-    expires_at = datetime.fromisoformat(token_doc['expires_at'])
-    if expires_at < datetime.now(timezone.utc):
+    if token_doc['expires_at'] < datetime.now(timezone.utc):
         # Delete expired token
         await db.refresh_tokens.delete_one({"token": refresh_token})
         raise HTTPException(
@@ -284,6 +278,7 @@ async def setup_2fa(current_user: dict = Depends(get_current_user)):
             "two_fa_enabled": False  # Will be enabled after verification
         }}
     )
+    await invalidate_principal(current_user['id'])
     
     return {
         "secret": secret,
@@ -316,6 +311,7 @@ async def verify_2fa(otp_code: str, current_user: dict = Depends(get_current_use
         {"id": current_user['id']},
         {"$set": {"two_fa_enabled": True}}
     )
+    await invalidate_principal(current_user['id'])
     
     # Log action
     await log_action(
@@ -1,45 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from routes.auth import get_current_user
 from database import get_db
 from models import DepartmentCreate, DepartmentResponse
 from utils.permissions import Permissions
 from utils.audit import log_action
+from utils.factions import faction_registry
 from utils.notifications import NotificationService
+from utils.etag import content_etag, set_etag, is_not_modified, not_modified_response
+from utils.stats import invalidate_admin_stats
+from utils.access import resolve_department_access
 from models import NotificationTypeEnum
-from datetime import datetime
 from typing import List
 import uuid
 
 router = APIRouter(prefix="/departments", tags=["departments"])
 
 @router.get("/{department_id}", response_model=DepartmentResponse)
-async def get_department(department_id: str, current_user: dict = Depends(get_current_user)):
+async def get_department(department_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """Get department by ID"""
-    db = get_db()
-    
-    department = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if not department:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
-        )
-    
-    # Get faction info
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get department with its faction info
+    context = await resolve_department_access(department_id)
+    department = context.department
     
     # Check permission
-    if faction and not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), faction['code']):
+    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), context.faction_code):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view this department"
         )
     
     # Add faction_code for frontend convenience
-    if faction:
-        department['faction_code'] = faction['code']
+    department['faction_code'] = context.faction_code
     
-    if isinstance(department.get('created_at'), str):
-        department['created_at'] = datetime.fromisoformat(department['created_at'])
+    # Skip serialisation entirely if the client already has this department
+    etag = content_etag(department)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
     return department
 
@@ -56,7 +53,7 @@ async def get_faction_departments(faction_code: str, current_user: dict = Depend
         )
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -65,11 +62,6 @@ async def get_faction_departments(faction_code: str, current_user: dict = Depend
     
     departments = await db.departments.find({"faction_id": faction['id']}, {"_id": 0}).to_list(100)
     
-    # Convert datetime strings
-    for dept in departments:
-        if isinstance(dept.get('created_at'), str):
-            dept['created_at'] = datetime.fromisoformat(dept['created_at'])
-    
     return departments
 
 @router.post("/faction/{faction_code}", response_model=DepartmentResponse)
@@ -78,7 +70,7 @@ async def create_department(faction_code: str, department_data: DepartmentCreate
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,9 +97,9 @@ async def create_department(faction_code: str, department_data: DepartmentCreate
     
     department = DepartmentBase(**dept_dict)
     doc = department.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.departments.insert_one(doc)
+    invalidate_admin_stats()
     
     # Create default table structure for the department
     from models import TableStructure, TableStructureColumn
@@ -126,8 +118,6 @@ async def create_department(faction_code: str, department_data: DepartmentCreate
     
     table_structure = TableStructure(department_id=doc['id'], columns=default_columns)
     struct_doc = table_structure.model_dump()
-    struct_doc['created_at'] = struct_doc['created_at'].isoformat()
-    struct_doc['updated_at'] = struct_doc['updated_at'].isoformat()
     
     await db.table_structures.insert_one(struct_doc)
     
@@ -141,9 +131,6 @@ async def create_department(faction_code: str, department_data: DepartmentCreate
         new_value={"name": department_data.name, "faction": faction_code}
     )
     
-    # Convert back datetime
-    doc['created_at'] = datetime.fromisoformat(doc['created_at'])
-    
     return doc
 
 @router.put("/{department_id}", response_model=DepartmentResponse)
@@ -151,22 +138,15 @@ async def update_department(department_id: str, department_data: DepartmentCreat
     """Update department"""
     db = get_db()
     
-    # Get department
-    department = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if not department:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
-        )
-    
-    # Get faction
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get department and faction
+    context = await resolve_department_access(department_id)
+    department = context.department
     
     # Check permission
     if not Permissions.can_manage_department(
         current_user['role'],
         current_user.get('faction'),
-        faction['code'],
+        context.faction_code,
         department_id,
         current_user.get('department_id')
     ):
@@ -196,8 +176,6 @@ async def update_department(department_id: str, department_data: DepartmentCreat
     
     # Get updated department
     updated_dept = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if isinstance(updated_dept.get('created_at'), str):
-        updated_dept['created_at'] = datetime.fromisoformat(updated_dept['created_at'])
     
     return updated_dept
 
@@ -206,22 +184,15 @@ async def delete_department(department_id: str, current_user: dict = Depends(get
     """Delete department"""
     db = get_db()
     
-    # Get department
-    department = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if not department:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
-        )
-    
-    # Get faction
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get department and faction
+    context = await resolve_department_access(department_id)
+    department = context.department
     
     # Check permission
     if not Permissions.can_manage_department(
         current_user['role'],
         current_user.get('faction'),
-        faction['code'],
+        context.faction_code,
         department_id,
         current_user.get('department_id')
     ):
@@ -237,16 +208,16 @@ async def delete_department(department_id: str, current_user: dict = Depends(get
     
     # Delete department
     await db.departments.delete_one({"id": department_id})
+    invalidate_admin_stats()
     
     # Notify affected users
-    affected_users = await db.users.find({"department_id": department_id}, {"_id": 0}).to_list(100)
-    for user in affected_users:
-        await NotificationService.create_notification(
-            user_id=user['id'],
-            notification_type=NotificationTypeEnum.DEPARTMENT_DELETED,
-            title="Отдел удалён",
-            message=f"Отдел '{department['name']}' был удалён"
-        )
+    affected_users = await db.users.find({"department_id": department_id}, {"_id": 0, "id": 1}).to_list(None)
+    await NotificationService.create_notifications_bulk(
+        user_ids=[user['id'] for user in affected_users],
+        notification_type=NotificationTypeEnum.DEPARTMENT_DELETED,
+        title="Отдел удалён",
+        message=f"Отдел '{department['name']}' был удалён"
+    )
     
     # Log action
     await log_action(
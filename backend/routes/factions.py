@@ -4,7 +4,7 @@ from database import get_db
 from models import FactionResponse, FactionEnum
 from utils.permissions import Permissions
 from utils.audit import log_action
-from datetime import datetime
+from utils.factions import faction_registry
 from typing import List, Optional
 
 router = APIRouter(prefix="/factions", tags=["factions"])
@@ -24,30 +24,22 @@ FACTIONS_DATA = [
 @router.get("/", response_model=List[FactionResponse])
 async def get_factions(current_user: dict = Depends(get_current_user)):
     """Get list of factions (filtered by user permissions)"""
-    db = get_db()
-    
     # Check if user can access all factions
     if Permissions.can_access_all_factions(current_user['role']):
         # Return all factions
-        factions = await db.factions.find({}, {"_id": 0}).to_list(100)
+        factions = await faction_registry.all()
     else:
         # Return only user's faction
         if not current_user.get('faction'):
             return []
-        factions = await db.factions.find({"code": current_user['faction']}, {"_id": 0}).to_list(1)
-    
-    # Convert datetime strings
-    for faction in factions:
-        if isinstance(faction.get('created_at'), str):
-            faction['created_at'] = datetime.fromisoformat(faction['created_at'])
+        faction = await faction_registry.get_by_code(current_user['faction'])
+        factions = [faction] if faction else []
     
     return factions
 
 @router.get("/{faction_code}", response_model=FactionResponse)
 async def get_faction(faction_code: str, current_user: dict = Depends(get_current_user)):
     """Get faction details"""
-    db = get_db()
-    
     # Check permission
     if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), faction_code):
         raise HTTPException(
@@ -55,16 +47,13 @@ async def get_faction(faction_code: str, current_user: dict = Depends(get_curren
             detail="You don't have permission to view this faction"
         )
     
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Faction not found"
         )
     
-    if isinstance(faction.get('created_at'), str):
-        faction['created_at'] = datetime.fromisoformat(faction['created_at'])
-    
     return faction
 
 @router.post("/initialize")
@@ -81,6 +70,7 @@ async def initialize_factions(current_user: dict = Depends(get_current_user)):
     # Check if already initialized
     existing_count = await db.factions.count_documents({})
     if existing_count > 0:
+        await faction_registry.load()
         return {"message": f"Factions already initialized ({existing_count} factions exist)"}
     
     # Insert all factions
@@ -88,9 +78,11 @@ async def initialize_factions(current_user: dict = Depends(get_current_user)):
     for faction_data in FACTIONS_DATA:
         faction = FactionBase(**faction_data)
         doc = faction.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
         await db.factions.insert_one(doc)
     
+    # Make the new factions visible to routes right away
+    await faction_registry.load()
+    
     # Log action
     await log_action(
         user_id=current_user['id'],
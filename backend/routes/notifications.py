@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from routes.auth import get_current_user
 from database import get_db
 from models import NotificationResponse
-from utils.notifications import NotificationService
+from utils.notifications import NotificationService, get_unread_count
 from datetime import datetime
 from typing import List
 
@@ -17,6 +17,11 @@ async def get_notifications(unread_only: bool = False, current_user: dict = Depe
     )
     return notifications
 
+@router.get("/unread-count")
+async def get_notifications_unread_count(current_user: dict = Depends(get_current_user)):
+    """Get number of unread notifications (header badge)"""
+    return {"unread_count": await get_unread_count(current_user['id'])}
+
 @router.post("/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
     """Mark notification as read"""
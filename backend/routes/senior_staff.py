@@ -1,22 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from routes.auth import get_current_user
 from database import get_db
 from models import SeniorStaffTable, SeniorStaffTableUpdate, SeniorStaffRow
 from utils.permissions import Permissions
 from utils.audit import log_action
+from utils.factions import faction_registry
+from utils.etag import version_etag, get_expected_version, version_query
 from datetime import datetime, timezone
-from typing import List
+from typing import List, Optional
 import uuid
 
 router = APIRouter(prefix="/senior-staff", tags=["senior-staff"])
 
 @router.get("/faction/{faction_code}")
-async def get_senior_staff_table(faction_code: str, current_user: dict = Depends(get_current_user)):
+async def get_senior_staff_table(faction_code: str, response: Response, current_user: dict = Depends(get_current_user)):
     """Get senior staff table for a faction"""
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,17 +42,13 @@ async def get_senior_staff_table(faction_code: str, current_user: dict = Depends
             rows=[]
         )
         table_doc = new_table.model_dump()
-        table_doc['created_at'] = table_doc['created_at'].isoformat()
-        table_doc['updated_at'] = table_doc['updated_at'].isoformat()
         
         await db.senior_staff.insert_one(table_doc)
         table = table_doc
+        table.pop('_id', None)
     
-    # Convert datetime strings
-    if isinstance(table.get('created_at'), str):
-        table['created_at'] = datetime.fromisoformat(table['created_at'])
-    if isinstance(table.get('updated_at'), str):
-        table['updated_at'] = datetime.fromisoformat(table['updated_at'])
+    table['version'] = table.get('version', 0)
+    response.headers["ETag"] = version_etag(table['version'])
     
     return table
 
@@ -58,13 +56,16 @@ async def get_senior_staff_table(faction_code: str, current_user: dict = Depends
 async def update_senior_staff_table(
     faction_code: str, 
     data: SeniorStaffTableUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Update senior staff table for a faction"""
+    """Update senior staff table for a faction (conditional on If-Match when given)"""
     db = get_db()
+    expected_version = get_expected_version(if_match)
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -78,35 +79,46 @@ async def update_senior_staff_table(
             detail="Only faction leader or higher can edit senior staff table"
         )
     
-    # Get old data for audit
-    old_table = await db.senior_staff.find_one({"faction_id": faction['id']}, {"_id": 0})
-    
     # Prepare rows data
     rows_data = [row.model_dump() for row in data.rows]
     
+    # Update existing table, reading back only the previous row count and version
+    query = {"faction_id": faction['id']}
+    if expected_version is not None:
+        query.update(version_query(expected_version))
+    
+    old_table = await db.senior_staff.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "rows": rows_data,
+                "updated_at": datetime.now(timezone.utc)
+            },
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0, "version": 1, "rows_count": {"$size": {"$ifNull": ["$rows", []]}}}
+    )
+    
     if old_table:
-        # Update existing table
-        result = await db.senior_staff.update_one(
-            {"faction_id": faction['id']},
-            {
-                "$set": {
-                    "rows": rows_data,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
-        )
+        new_version = old_table.get('version', 0) + 1
     else:
+        current = await db.senior_staff.find_one({"faction_id": faction['id']}, {"_id": 0, "version": 1})
+        if current:
+            raise_version_conflict(current)
+        
         # Create new table
         new_table = SeniorStaffTable(
             faction_id=faction['id'],
-            rows=data.rows
+            rows=data.rows,
+            version=1
         )
         table_doc = new_table.model_dump()
         table_doc['rows'] = rows_data
-        table_doc['created_at'] = table_doc['created_at'].isoformat()
-        table_doc['updated_at'] = table_doc['updated_at'].isoformat()
         
         await db.senior_staff.insert_one(table_doc)
+        new_version = 1
+    
+    response.headers["ETag"] = version_etag(new_version)
     
     # Log action
     await log_action(
@@ -115,11 +127,11 @@ async def update_senior_staff_table(
         action="senior_staff_updated",
         resource_type="senior_staff",
         resource_id=faction['id'],
-        old_value={"rows_count": len(old_table.get('rows', [])) if old_table else 0},
+        old_value={"rows_count": old_table.get('rows_count', 0) if old_table else 0},
         new_value={"rows_count": len(rows_data)}
     )
     
-    return {"message": "Senior staff table updated successfully"}
+    return {"message": "Senior staff table updated successfully", "version": new_version}
 
 @router.post("/faction/{faction_code}/row")
 async def add_senior_staff_row(
@@ -131,7 +143,7 @@ async def add_senior_staff_row(
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,32 +157,33 @@ async def add_senior_staff_row(
             detail="Only faction leader or higher can edit senior staff table"
         )
     
-    # Get or create table
-    table = await db.senior_staff.find_one({"faction_id": faction['id']}, {"_id": 0})
-    
     row_data = row.model_dump()
     
+    # Add row to existing table
+    table = await db.senior_staff.find_one_and_update(
+        {"faction_id": faction['id']},
+        {
+            "$push": {"rows": row_data},
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0, "version": 1}
+    )
+    
     if table:
-        # Add row to existing table
-        await db.senior_staff.update_one(
-            {"faction_id": faction['id']},
-            {
-                "$push": {"rows": row_data},
-                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
-            }
-        )
+        new_version = table.get('version', 0) + 1
     else:
         # Create new table with this row
         new_table = SeniorStaffTable(
             faction_id=faction['id'],
-            rows=[row]
+            rows=[row],
+            version=1
         )
         table_doc = new_table.model_dump()
         table_doc['rows'] = [row_data]
-        table_doc['created_at'] = table_doc['created_at'].isoformat()
-        table_doc['updated_at'] = table_doc['updated_at'].isoformat()
         
         await db.senior_staff.insert_one(table_doc)
+        new_version = 1
     
     # Log action
     await log_action(
@@ -182,19 +195,21 @@ async def add_senior_staff_row(
         new_value={"employee_name": row.employee_name}
     )
     
-    return {"message": "Row added successfully"}
+    return {"message": "Row added successfully", "version": new_version}
 
 @router.delete("/faction/{faction_code}/row/{row_index}")
 async def delete_senior_staff_row(
     faction_code: str,
     row_index: int,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a row from senior staff table"""
     db = get_db()
+    expected_version = get_expected_version(if_match)
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -216,23 +231,34 @@ async def delete_senior_staff_row(
             detail="Row not found"
         )
     
+    version = table.get('version', 0)
+    if expected_version is not None and expected_version != version:
+        raise_version_conflict(table)
+    
     # Get the row being deleted for audit
     deleted_row = table['rows'][row_index]
     
-    # Remove the row
+    # Remove the row, only if nobody changed the table since we read it
     rows = table.get('rows', [])
     rows.pop(row_index)
     
-    await db.senior_staff.update_one(
-        {"faction_id": faction['id']},
+    result = await db.senior_staff.update_one(
+        {"faction_id": faction['id'], **version_query(version)},
         {
             "$set": {
                 "rows": rows,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
+                "updated_at": datetime.now(timezone.utc)
+            },
+            "$inc": {"version": 1}
         }
     )
     
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Senior staff table was modified by someone else. Reload the table."
+        )
+    
     # Log action
     await log_action(
         user_id=current_user['id'],
@@ -243,4 +269,11 @@ async def delete_senior_staff_row(
         old_value={"employee_name": deleted_row.get('employee_name')}
     )
     
-    return {"message": "Row deleted successfully"}
+    return {"message": "Row deleted successfully", "version": version + 1}
+
+def raise_version_conflict(current: dict):
+    """Raise 409 for a write against a stale table version"""
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Senior staff table was modified by someone else (current version {current.get('version', 0)}). Reload the table."
+    )
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from routes.auth import get_current_user
 from database import get_db
 from models import LectureTopicCreate, LectureTopicResponse, TrainingTopicCreate, TrainingTopicResponse
 from utils.permissions import Permissions
 from utils.audit import log_action
+from utils.factions import faction_registry
+from utils.etag import content_etag, set_etag, is_not_modified, not_modified_response
+from utils.access import find_with_faction
 from datetime import datetime
 from typing import List
 import uuid
@@ -17,7 +20,7 @@ async def get_lecture_topics(faction_code: str, current_user: dict = Depends(get
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -33,11 +36,6 @@ async def get_lecture_topics(faction_code: str, current_user: dict = Depends(get
     
     topics = await db.lecture_topics.find({"faction_id": faction['id']}, {"_id": 0}).sort("order", 1).to_list(100)
     
-    # Convert datetime strings
-    for topic in topics:
-        if isinstance(topic.get('created_at'), str):
-            topic['created_at'] = datetime.fromisoformat(topic['created_at'])
-    
     return topics
 
 @router.post("/lectures/faction/{faction_code}", response_model=LectureTopicResponse)
@@ -46,7 +44,7 @@ async def create_lecture_topic(faction_code: str, topic_data: LectureTopicCreate
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -83,7 +81,6 @@ async def create_lecture_topic(faction_code: str, topic_data: LectureTopicCreate
     
     topic = LectureTopic(**topic_dict)
     doc = topic.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.lecture_topics.insert_one(doc)
     
@@ -97,7 +94,6 @@ async def create_lecture_topic(faction_code: str, topic_data: LectureTopicCreate
         new_value={"topic": topic_data.topic, "faction": faction_code}
     )
     
-    doc['created_at'] = datetime.fromisoformat(doc['created_at'])
     return doc
 
 @router.delete("/lectures/{topic_id}")
@@ -105,16 +101,14 @@ async def delete_lecture_topic(topic_id: str, current_user: dict = Depends(get_c
     """Delete lecture topic"""
     db = get_db()
     
-    # Get topic
-    topic = await db.lecture_topics.find_one({"id": topic_id}, {"_id": 0})
-    if not topic:
+    # Get topic and its faction
+    result = await find_with_faction(db.lecture_topics, {"id": topic_id})
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
-    
-    # Get faction
-    faction = await db.factions.find_one({"id": topic['faction_id']}, {"_id": 0})
+    topic, faction = result
     
     # Check permission
     if not (current_user['role'].startswith('leader_') or 
@@ -152,7 +146,7 @@ async def get_training_topics(faction_code: str, current_user: dict = Depends(ge
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -168,11 +162,6 @@ async def get_training_topics(faction_code: str, current_user: dict = Depends(ge
     
     topics = await db.training_topics.find({"faction_id": faction['id']}, {"_id": 0}).sort("order", 1).to_list(100)
     
-    # Convert datetime strings
-    for topic in topics:
-        if isinstance(topic.get('created_at'), str):
-            topic['created_at'] = datetime.fromisoformat(topic['created_at'])
-    
     return topics
 
 @router.post("/trainings/faction/{faction_code}", response_model=TrainingTopicResponse)
@@ -181,7 +170,7 @@ async def create_training_topic(faction_code: str, topic_data: TrainingTopicCrea
     db = get_db()
     
     # Get faction
-    faction = await db.factions.find_one({"code": faction_code}, {"_id": 0})
+    faction = await faction_registry.get_by_code(faction_code)
     if not faction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -218,7 +207,6 @@ async def create_training_topic(faction_code: str, topic_data: TrainingTopicCrea
     
     topic = TrainingTopic(**topic_dict)
     doc = topic.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.training_topics.insert_one(doc)
     
@@ -232,7 +220,6 @@ async def create_training_topic(faction_code: str, topic_data: TrainingTopicCrea
         new_value={"topic": topic_data.topic, "faction": faction_code}
     )
     
-    doc['created_at'] = datetime.fromisoformat(doc['created_at'])
     return doc
 
 @router.delete("/trainings/{topic_id}")
@@ -240,16 +227,14 @@ async def delete_training_topic(topic_id: str, current_user: dict = Depends(get_
     """Delete training topic"""
     db = get_db()
     
-    # Get topic
-    topic = await db.training_topics.find_one({"id": topic_id}, {"_id": 0})
-    if not topic:
+    # Get topic and its faction
+    result = await find_with_faction(db.training_topics, {"id": topic_id})
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
-    
-    # Get faction
-    faction = await db.factions.find_one({"id": topic['faction_id']}, {"_id": 0})
+    topic, faction = result
     
     # Check permission
     if not (current_user['role'].startswith('leader_') or 
@@ -283,7 +268,7 @@ async def delete_training_topic(topic_id: str, current_user: dict = Depends(get_
 
 # Department-level topics (for department heads)
 @router.get("/lectures/department/{department_id}", response_model=List[LectureTopicResponse])
-async def get_department_lecture_topics(department_id: str, current_user: dict = Depends(get_current_user)):
+async def get_department_lecture_topics(department_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """Get lecture topics for a department (inherits from faction or custom)"""
     db = get_db()
     
@@ -299,17 +284,20 @@ async def get_department_lecture_topics(department_id: str, current_user: dict =
     custom_topics = await db.department_lecture_topics.find({"department_id": department_id}, {"_id": 0}).sort("order", 1).to_list(100)
     
     if custom_topics:
-        for topic in custom_topics:
-            if isinstance(topic.get('created_at'), str):
-                topic['created_at'] = datetime.fromisoformat(topic['created_at'])
+        etag = content_etag("department", custom_topics)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        set_etag(response, etag)
+        
         return custom_topics
     
     # Otherwise return faction topics
     topics = await db.lecture_topics.find({"faction_id": department['faction_id']}, {"_id": 0}).sort("order", 1).to_list(100)
     
-    for topic in topics:
-        if isinstance(topic.get('created_at'), str):
-            topic['created_at'] = datetime.fromisoformat(topic['created_at'])
+    etag = content_etag("faction", topics)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
     return topics
 
@@ -355,7 +343,7 @@ async def create_department_lecture_topic(department_id: str, topic_data: Lectur
         'faction_id': department['faction_id'],
         'topic': topic_data.topic,
         'order': order,
-        'created_at': datetime.now(timezone.utc).isoformat(),
+        'created_at': datetime.now(timezone.utc),
         'created_by': current_user['id']
     }
     
@@ -371,7 +359,6 @@ async def create_department_lecture_topic(department_id: str, topic_data: Lectur
         new_value={"topic": topic_data.topic, "department_id": department_id}
     )
     
-    topic_doc['created_at'] = datetime.fromisoformat(topic_doc['created_at'])
     return topic_doc
 
 @router.delete("/lectures/department/{department_id}/{topic_id}")
@@ -421,7 +408,7 @@ async def delete_department_lecture_topic(department_id: str, topic_id: str, cur
     return {"message": "Topic deleted successfully"}
 
 @router.get("/trainings/department/{department_id}", response_model=List[TrainingTopicResponse])
-async def get_department_training_topics(department_id: str, current_user: dict = Depends(get_current_user)):
+async def get_department_training_topics(department_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """Get training topics for a department (inherits from faction or custom)"""
     db = get_db()
     
@@ -437,17 +424,20 @@ async def get_department_training_topics(department_id: str, current_user: dict
     custom_topics = await db.department_training_topics.find({"department_id": department_id}, {"_id": 0}).sort("order", 1).to_list(100)
     
     if custom_topics:
-        for topic in custom_topics:
-            if isinstance(topic.get('created_at'), str):
-                topic['created_at'] = datetime.fromisoformat(topic['created_at'])
+        etag = content_etag("department", custom_topics)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        set_etag(response, etag)
+        
         return custom_topics
     
     # Otherwise return faction topics
     topics = await db.training_topics.find({"faction_id": department['faction_id']}, {"_id": 0}).sort("order", 1).to_list(100)
     
-    for topic in topics:
-        if isinstance(topic.get('created_at'), str):
-            topic['created_at'] = datetime.fromisoformat(topic['created_at'])
+    etag = content_etag("faction", topics)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
     return topics
 
@@ -493,7 +483,7 @@ async def create_department_training_topic(department_id: str, topic_data: Train
         'faction_id': department['faction_id'],
         'topic': topic_data.topic,
         'order': order,
-        'created_at': datetime.now(timezone.utc).isoformat(),
+        'created_at': datetime.now(timezone.utc),
         'created_by': current_user['id']
     }
     
@@ -509,7 +499,6 @@ async def create_department_training_topic(department_id: str, topic_data: Train
         new_value={"topic": topic_data.topic, "department_id": department_id}
     )
     
-    topic_doc['created_at'] = datetime.fromisoformat(topic_doc['created_at'])
     return topic_doc
 
 @router.delete("/trainings/department/{department_id}/{topic_id}")
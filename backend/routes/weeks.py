@@ -1,34 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request, Response
 from routes.auth import get_current_user
 from database import get_db
-from models import WeekResponse, TableDataUpdate
+from models import WeekResponse, TableDataUpdate, TableDataPatch
 from utils.permissions import Permissions
 from utils.audit import log_action
-from utils.weeks import get_week_boundaries, format_week_label
+from utils.weeks import get_week_boundaries, format_week_label, find_week, ensure_week
+from utils.access import resolve_department_access, resolve_week_access
+from utils.table_data import required_employees, build_patch_update
+from utils.tasks import spawn
+from utils.etag import version_etag, get_expected_version, version_query, content_etag, set_etag, is_not_modified, not_modified_response
+from pymongo import ReturnDocument
 from datetime import datetime, timezone
-from typing import List
-import uuid
+from typing import List, Optional
+import asyncio
 
 router = APIRouter(prefix="/weeks", tags=["weeks"])
 
+
 @router.get("/department/{department_id}", response_model=List[WeekResponse])
-async def get_department_weeks(department_id: str, current_user: dict = Depends(get_current_user)):
+async def get_department_weeks(department_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """Get all weeks for a department"""
     db = get_db()
     
-    # Get department
-    department = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if not department:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
-        )
-    
-    # Get faction
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get department and faction
+    context = await resolve_department_access(department_id)
     
     # Check permission
-    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), faction['code']):
+    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), context.faction_code):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view this department's weeks"
@@ -36,171 +34,104 @@ async def get_department_weeks(department_id: str, current_user: dict = Depends(
     
     weeks = await db.weeks.find({"department_id": department_id}, {"_id": 0}).sort("week_start", -1).to_list(100)
     
-    # Convert datetime strings
-    for week in weeks:
-        if isinstance(week.get('week_start'), str):
-            week['week_start'] = datetime.fromisoformat(week['week_start'])
-        if isinstance(week.get('week_end'), str):
-            week['week_end'] = datetime.fromisoformat(week['week_end'])
-        if isinstance(week.get('created_at'), str):
-            week['created_at'] = datetime.fromisoformat(week['created_at'])
+    # Skip serialisation entirely if the client already has this list
+    etag = content_etag([(week['id'], week.get('is_current'), week.get('week_start')) for week in weeks])
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     
     return weeks
 
 @router.get("/department/{department_id}/current", response_model=WeekResponse)
 async def get_current_week(department_id: str, current_user: dict = Depends(get_current_user)):
     """Get or create current week for department"""
-    db = get_db()
-    
-    # Get department
-    department = await db.departments.find_one({"id": department_id}, {"_id": 0})
-    if not department:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Department not found"
-        )
+    # Get week boundaries
+    monday, sunday = get_week_boundaries()
     
-    # Get faction
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Load department/faction and look up the current week concurrently
+    context, week = await asyncio.gather(
+        resolve_department_access(department_id),
+        find_week(department_id, monday)
+    )
     
     # Check permission
-    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), faction['code']):
+    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), context.faction_code):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view this department's weeks"
         )
     
-    # Get week boundaries
-    monday, sunday = get_week_boundaries()
-    
-    # Check if current week exists
-    week = await db.weeks.find_one(
-        {
-            "department_id": department_id,
-            "week_start": monday.isoformat()
-        },
-        {"_id": 0}
-    )
-    
     if not week:
-        # Create new week
-        from models import WeekBase
-        week_obj = WeekBase(
-            department_id=department_id,
-            week_start=monday,
-            week_end=sunday,
-            is_current=True
-        )
-        
-        # Mark all previous weeks as not current
-        await db.weeks.update_many(
-            {"department_id": department_id},
-            {"$set": {"is_current": False}}
-        )
-        
-        week_doc = week_obj.model_dump()
-        week_doc['week_start'] = week_doc['week_start'].isoformat()
-        week_doc['week_end'] = week_doc['week_end'].isoformat()
-        week_doc['created_at'] = week_doc['created_at'].isoformat()
-        
-        await db.weeks.insert_one(week_doc)
-        
-        # Create empty table data
-        from models import TableData
-        table_data = TableData(
-            week_id=week_doc['id'],
-            department_id=department_id,
-            rows=[]
-        )
-        
-        table_doc = table_data.model_dump()
-        table_doc['created_at'] = table_doc['created_at'].isoformat()
-        table_doc['updated_at'] = table_doc['updated_at'].isoformat()
+        # Create it (idempotent if several users open the department at once)
+        week, created = await ensure_week(department_id, monday, sunday, is_current=True)
         
-        await db.table_data.insert_one(table_doc)
-        
-        # Log action
-        await log_action(
-            user_id=current_user['id'],
-            user_email=current_user['email'],
-            action="week_created",
-            resource_type="week",
-            resource_id=week_doc['id']
-        )
-        
-        week = week_doc
-    
-    # Convert datetime strings
-    if isinstance(week.get('week_start'), str):
-        week['week_start'] = datetime.fromisoformat(week['week_start'])
-    if isinstance(week.get('week_end'), str):
-        week['week_end'] = datetime.fromisoformat(week['week_end'])
-    if isinstance(week.get('created_at'), str):
-        week['created_at'] = datetime.fromisoformat(week['created_at'])
+        if created:
+            # Log action
+            await log_action(
+                user_id=current_user['id'],
+                user_email=current_user['email'],
+                action="week_created",
+                resource_type="week",
+                resource_id=week['id']
+            )
     
     return week
 
 @router.get("/{week_id}/table-data")
-async def get_week_table_data(week_id: str, current_user: dict = Depends(get_current_user)):
+async def get_week_table_data(week_id: str, request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     """Get table data for a specific week"""
     db = get_db()
     
-    # Get week
-    week = await db.weeks.find_one({"id": week_id}, {"_id": 0})
-    if not week:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Week not found"
-        )
-    
-    # Get department and faction for permission check
-    department = await db.departments.find_one({"id": week['department_id']}, {"_id": 0})
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get week, department and faction for permission check
+    context = await resolve_week_access(week_id)
     
     # Check permission
-    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), faction['code']):
+    if not Permissions.can_view_faction(current_user['role'], current_user.get('faction'), context.faction_code):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to view this table data"
         )
     
+    # Revalidation: compare versions without loading the rows
+    if request.headers.get("if-none-match"):
+        current = await db.table_data.find_one({"week_id": week_id}, {"_id": 0, "version": 1})
+        etag = version_etag(current.get('version', 0) if current else 0)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+    
     # Get table data
-    table_data = await db.table_data.find_one({"week_id": week_id}, {"_id": 0})
+    table_data = await db.table_data.find_one({"week_id": week_id}, {"_id": 0, "last_write_id": 0})
     if not table_data:
         # Return empty structure
-        return {"week_id": week_id, "rows": []}
+        set_etag(response, version_etag(0))
+        return {"week_id": week_id, "rows": [], "version": 0}
     
-    # Convert datetime strings
-    if isinstance(table_data.get('created_at'), str):
-        table_data['created_at'] = datetime.fromisoformat(table_data['created_at'])
-    if isinstance(table_data.get('updated_at'), str):
-        table_data['updated_at'] = datetime.fromisoformat(table_data['updated_at'])
+    table_data['version'] = table_data.get('version', 0)
+    set_etag(response, version_etag(table_data['version']))
     
     return table_data
 
 @router.put("/{week_id}/table-data")
-async def update_week_table_data(week_id: str, data: TableDataUpdate, current_user: dict = Depends(get_current_user)):
-    """Update table data for a week"""
+async def update_week_table_data(
+    week_id: str,
+    data: TableDataUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Update table data for a week (conditional on If-Match when given)"""
     db = get_db()
+    expected_version = get_expected_version(if_match)
     
-    # Get week
-    week = await db.weeks.find_one({"id": week_id}, {"_id": 0})
-    if not week:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Week not found"
-        )
-    
-    # Get department and faction for permission check
-    department = await db.departments.find_one({"id": week['department_id']}, {"_id": 0})
-    faction = await db.factions.find_one({"id": department['faction_id']}, {"_id": 0})
+    # Get week, department and faction for permission check
+    context = await resolve_week_access(week_id)
     
     # Check permission
     if not Permissions.can_edit_table(
         current_user['role'],
         current_user.get('faction'),
-        faction['code'],
-        department['id'],
+        context.faction_code,
+        context.department['id'],
         current_user.get('department_id')
     ):
         raise HTTPException(
@@ -208,27 +139,30 @@ async def update_week_table_data(week_id: str, data: TableDataUpdate, current_us
             detail="You don't have permission to edit this table"
         )
     
-    # Get old data for audit log
-    old_data = await db.table_data.find_one({"week_id": week_id}, {"_id": 0})
-    
-    # Update table data
+    # Update table data, reading back only the previous row count and version
     rows_data = [row.model_dump() for row in data.rows]
     
-    result = await db.table_data.update_one(
-        {"week_id": week_id},
+    query = {"week_id": week_id}
+    if expected_version is not None:
+        query.update(version_query(expected_version))
+    
+    old_data = await db.table_data.find_one_and_update(
+        query,
         {
             "$set": {
                 "rows": rows_data,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-        }
+                "updated_at": datetime.now(timezone.utc)
+            },
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0, "version": 1, "rows_count": {"$size": {"$ifNull": ["$rows", []]}}}
     )
     
-    if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Table data not found"
-        )
+    if old_data is None:
+        await raise_write_failure(db, week_id)
+    
+    new_version = old_data.get('version', 0) + 1
+    response.headers["ETag"] = version_etag(new_version)
     
     # Log action
     await log_action(
@@ -237,20 +171,156 @@ async def update_week_table_data(week_id: str, data: TableDataUpdate, current_us
         action="table_data_updated",
         resource_type="table_data",
         resource_id=week_id,
-        old_value={"rows_count": len(old_data.get('rows', [])) if old_data else 0},
+        old_value={"rows_count": old_data.get('rows_count', 0)},
         new_value={"rows_count": len(rows_data)}
     )
     
-    # Broadcast via WebSocket
+    broadcast_table_change(
+        context.department['id'], week_id, current_user,
+        version=new_version, base_version=new_version - 1, rows=rows_data
+    )
+    
+    return {"message": "Table data updated successfully", "version": new_version}
+
+@router.patch("/{week_id}/table-data")
+async def patch_week_table_data(
+    week_id: str,
+    data: TableDataPatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Apply cell-level changes (set cell, add/remove row, rename employee) to table data for a week"""
+    db = get_db()
+    expected_version = get_expected_version(if_match)
+    
+    # Get week, department and faction for permission check
+    context = await resolve_week_access(week_id)
+    
+    # Check permission
+    if not Permissions.can_edit_table(
+        current_user['role'],
+        current_user.get('faction'),
+        context.faction_code,
+        context.department['id'],
+        current_user.get('department_id')
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to edit this table"
+        )
+    
+    if not data.operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No operations to apply"
+        )
+    
+    try:
+        required = required_employees(data.operations)
+        update, array_filters = build_patch_update(data.operations, datetime.now(timezone.utc))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    # One conditional update: it only matches while every targeted employee
+    # still has a row (and, with If-Match, the version is unchanged), so a
+    # patch lands completely or not at all
+    query = {"week_id": week_id}
+    if expected_version is not None:
+        query.update(version_query(expected_version))
+    if required:
+        query["$and"] = [{"rows": {"$elemMatch": {"employee_name": name}}} for name in required]
+    
+    updated = await db.table_data.find_one_and_update(
+        query,
+        update,
+        array_filters=array_filters,
+        projection={"_id": 0, "version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if updated is None:
+        await raise_patch_failure(db, week_id, expected_version, required)
+    
+    new_version = updated['version']
+    base_version = new_version - 1
+    response.headers["ETag"] = version_etag(new_version)
+    
+    # Log action
+    await log_action(
+        user_id=current_user['id'],
+        user_email=current_user['email'],
+        action="table_data_patched",
+        resource_type="table_data",
+        resource_id=week_id,
+        new_value={
+            "operations": len(data.operations),
+            "types": sorted({operation.op for operation in data.operations})
+        }
+    )
+    
+    broadcast_table_change(
+        context.department['id'], week_id, current_user,
+        version=new_version, base_version=base_version,
+        operations=[operation.model_dump(exclude_none=True) for operation in data.operations]
+    )
+    
+    return {"message": "Table data updated successfully", "operations": len(data.operations), "version": new_version}
+
+async def raise_write_failure(db, week_id: str):
+    """Raise 409 if the table exists at another version, 404 otherwise"""
+    current = await db.table_data.find_one({"week_id": week_id}, {"_id": 0, "version": 1})
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Table data not found"
+        )
+    
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Table data was modified by someone else (current version {current.get('version', 0)}). Reload the table."
+    )
+
+async def raise_patch_failure(db, week_id: str, expected_version: Optional[int], required: List[str]):
+    """Explain why a patch matched nothing: 404, 409 on a version mismatch, 422 for a missing row"""
+    current = await db.table_data.find_one({"week_id": week_id}, {"_id": 0, "version": 1, "rows.employee_name": 1})
+    if current is None or (expected_version is not None and current.get('version', 0) != expected_version):
+        await raise_write_failure(db, week_id)
+    
+    names = {row.get('employee_name') for row in current.get('rows') or []}
+    missing = [name for name in required if name not in names]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No row for employee {missing[0]!r}"
+        )
+    
+    # The rows changed between the update and this check
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Table data is being modified concurrently. Reload the table."
+    )
+
+def broadcast_table_change(department_id: str, week_id: str, current_user: dict, **delta):
+    """Notify department viewers about a table change via WebSocket (in the background)"""
     try:
         from websocket_server import broadcast_table_update
-        import asyncio
-        asyncio.create_task(broadcast_table_update(
-            department['id'], 
-            week_id, 
-            current_user.get('full_name', current_user['email'])
-        ))
+        spawn(
+            broadcast_table_update(
+                department_id,
+                week_id,
+                current_user.get('full_name', current_user['email']),
+                **delta
+            ),
+            name=f"broadcast_table_update:{week_id}"
+        )
     except Exception as e:
         print(f"WebSocket broadcast error: {e}")
-    
-    return {"message": "Table data updated successfully"}
@@ -7,10 +7,14 @@ import socketio
 
 # Import database
 from database import connect_db, close_db
+from utils.audit import audit_writer
+from utils.factions import faction_registry
+from utils.security import password_executor
+from utils.rollover import week_rollover
+from utils.retention import audit_archiver
 
 # Import routes
-from routes import auth, factions, departments, weeks, topics, notifications, audit, admin
-# from routes import senior_staff  # Disabled temporarily
+from routes import auth, factions, departments, weeks, topics, notifications, audit, admin, senior_staff
 
 # Import WebSocket server
 from websocket_server import sio
@@ -61,6 +65,7 @@ app.add_middleware(
     allow_origins=config.CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Mount Socket.IO
@@ -74,11 +79,22 @@ socket_app = socketio.ASGIApp(
 @app.on_event("startup")
 async def startup_db():
     await connect_db()
+    await faction_registry.load()
+    audit_writer.start()
+    if config.WEEK_ROLLOVER_ENABLED:
+        week_rollover.start()
+    if config.AUDIT_ARCHIVE_DIR:
+        audit_archiver.start()
     logger.info("Application started")
 
 @app.on_event("shutdown")
 async def shutdown_db():
+    await week_rollover.stop()
+    await audit_archiver.stop()
+    # Flush queued audit entries while the database is still connected
+    await audit_writer.stop(timeout=config.AUDIT_DRAIN_TIMEOUT_SECONDS)
     await close_db()
+    password_executor.shutdown(wait=False)
     logger.info("Application shutdown")
 
 # Configure logging
@@ -67,6 +67,33 @@ class TestAdminStats:
         
         print(f"Stats: {data['total_users']} users, {data['total_factions']} factions, {data['total_departments']} departments")
         print(f"Recent logins (24h): {data['recent_logins_24h']}")
+    
+    def test_admin_stats_reflect_user_changes(self, auth_headers):
+        """Test the cached stats snapshot is refreshed by user create/delete"""
+        before = requests.get(f"{BASE_URL}/api/admin/stats", headers=auth_headers).json()
+        
+        unique_id = str(uuid.uuid4())[:8]
+        create_response = requests.post(
+            f"{BASE_URL}/api/admin/users",
+            headers=auth_headers,
+            json={
+                "email": f"TEST_stats_{unique_id}@test.com",
+                "password": "testpass123",
+                "full_name": f"TEST Stats {unique_id}",
+                "nickname": f"TEST_StatsNick_{unique_id}",
+                "role": "zgs"
+            }
+        )
+        assert create_response.status_code == 200
+        user_id = create_response.json()["id"]
+        
+        created = requests.get(f"{BASE_URL}/api/admin/stats", headers=auth_headers).json()
+        assert created["total_users"] == before["total_users"] + 1
+        
+        requests.delete(f"{BASE_URL}/api/admin/users/{user_id}", headers=auth_headers)
+        deleted = requests.get(f"{BASE_URL}/api/admin/stats", headers=auth_headers).json()
+        assert deleted["total_users"] == before["total_users"]
+        print("Admin stats snapshot invalidated on user changes")
 
 
 class TestAdminRolesAndFactions:
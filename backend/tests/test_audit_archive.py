@@ -0,0 +1,67 @@
+"""
+Tests for audit log archive files
+Tests: Monthly gzipped NDJSON archives are appended, listed and read back with filters
+(in-process, no running backend needed)
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.retention import list_archives, read_archive, serialize_entry, write_archive_lines
+
+
+def make_entry(log_id, action, day):
+    return {
+        "id": log_id,
+        "user_id": "TEST_user",
+        "user_email": "TEST_user@test.com",
+        "action": action,
+        "resource_type": "department",
+        "resource_id": "TEST_dept",
+        "old_value": None,
+        "new_value": None,
+        "ip_address": None,
+        "user_agent": None,
+        "timestamp": datetime(2024, 3, day, tzinfo=timezone.utc)
+    }
+
+
+class TestAuditArchive:
+    """Archive file tests"""
+    
+    def test_appends_are_read_back_in_order(self, tmp_path):
+        """Test two archive runs on the same month are read as one file, duplicates skipped"""
+        first = [make_entry("a1", "department_created", 1), make_entry("a2", "department_deleted", 2)]
+        second = [make_entry("a2", "department_deleted", 2), make_entry("a3", "department_created", 3)]
+        write_archive_lines(str(tmp_path), {"2024-03": [serialize_entry(entry) for entry in first]})
+        write_archive_lines(str(tmp_path), {"2024-03": [serialize_entry(entry) for entry in second]})
+        
+        entries = read_archive(str(tmp_path), "2024-03")
+        assert [entry["id"] for entry in entries] == ["a1", "a2", "a3"]
+        assert entries[0]["timestamp"] == "2024-03-01T00:00:00+00:00"
+        
+        created = read_archive(str(tmp_path), "2024-03", action="department_created")
+        assert [entry["id"] for entry in created] == ["a1", "a3"]
+        assert [entry["id"] for entry in read_archive(str(tmp_path), "2024-03", skip=1, limit=1)] == ["a2"]
+    
+    def test_list_and_invalid_months(self, tmp_path):
+        """Test archives are listed by month and unknown or malformed months are reported"""
+        write_archive_lines(str(tmp_path), {
+            "2024-02": [serialize_entry(make_entry("b1", "user_login", 1))],
+            "2024-03": [serialize_entry(make_entry("b2", "user_login", 1))]
+        })
+        (tmp_path / "notes.txt").write_text("not an archive")
+        
+        assert [archive["month"] for archive in list_archives(str(tmp_path))] == ["2024-02", "2024-03"]
+        assert list_archives(str(tmp_path / "missing")) == []
+        
+        with pytest.raises(ValueError):
+            read_archive(str(tmp_path), "2024-13")
+        with pytest.raises(ValueError):
+            read_archive(str(tmp_path), "../2024-03")
+        with pytest.raises(FileNotFoundError):
+            read_archive(str(tmp_path), "2023-01")
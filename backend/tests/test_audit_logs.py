@@ -0,0 +1,164 @@
+"""
+Backend API Tests for the audit log endpoint
+Tests: Cursor pagination, Date range filters
+"""
+import pytest
+import requests
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials (admin user)
+TEST_EMAIL = "vadim@emergent.dev"
+TEST_PASSWORD = "admin123"
+
+
+def login():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return response.json()
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with admin auth token, with a few logins in the audit log"""
+    for _ in range(5):
+        data = login()
+    
+    # Let the audit writer flush
+    time.sleep(1.5)
+    return {"Authorization": f"Bearer {data['access_token']}"}
+
+
+class TestAuditPagination:
+    """Keyset pagination tests"""
+    
+    def test_cursor_pages_match_single_page(self, auth_headers):
+        """Test walking pages with X-Next-Cursor returns the same logs as one big page"""
+        params = {"action": "user_login", "limit": 12}
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params=params)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        expected = [log["id"] for log in response.json()]
+        assert len(expected) >= 6
+        
+        ids = []
+        cursor = None
+        while len(ids) < len(expected):
+            page_params = {"action": "user_login", "limit": 3}
+            if cursor:
+                page_params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params=page_params)
+            assert response.status_code == 200, f"Failed: {response.text}"
+            page = response.json()
+            assert len(page) == 3
+            ids.extend(log["id"] for log in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if len(ids) < len(expected):
+                assert cursor, "Page without a next cursor before the end"
+        
+        assert ids[:len(expected)] == expected
+        print(f"Walked {len(ids)} logs in pages of 3")
+    
+    def test_invalid_cursor(self, auth_headers):
+        """Test a cursor that was not issued by the server is rejected"""
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={"cursor": "garbage"})
+        assert response.status_code == 400
+    
+    def test_cursor_with_skip_is_rejected(self, auth_headers):
+        """Test skip can't be combined with a cursor"""
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={"action": "user_login", "limit": 2})
+        cursor = response.headers["X-Next-Cursor"]
+        
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={"cursor": cursor, "skip": 1})
+        assert response.status_code == 400
+    
+    def test_exact_size_last_page_has_no_cursor(self, auth_headers):
+        """Test a last page that exactly fills the limit does not advertise another page"""
+        params = {"action": "user_login", "start_date": (datetime.now(timezone.utc) - timedelta(minutes=10)).isoformat()}
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={**params, "limit": 500})
+        count = len(response.json())
+        assert 0 < count < 500
+        
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={**params, "limit": count})
+        assert response.status_code == 200
+        assert len(response.json()) == count
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_last_page_has_no_cursor(self, auth_headers):
+        """Test a page shorter than the limit ends the walk"""
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={"action": "TEST_no_such_action"})
+        assert response.status_code == 200
+        assert response.json() == []
+        assert "X-Next-Cursor" not in response.headers
+
+
+class TestAuditDateRange:
+    """start_date / end_date filter tests"""
+    
+    def test_date_range(self, auth_headers):
+        """Test logs are limited to the requested time range"""
+        now = datetime.now(timezone.utc)
+        
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={
+            "action": "user_login",
+            "start_date": (now - timedelta(hours=1)).isoformat()
+        })
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert len(response.json()) >= 5
+        
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={
+            "action": "user_login",
+            "start_date": (now + timedelta(hours=1)).isoformat()
+        })
+        assert response.status_code == 200
+        assert response.json() == []
+        
+        response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={
+            "action": "user_login",
+            "end_date": (now - timedelta(days=3650)).isoformat()
+        })
+        assert response.status_code == 200
+        assert response.json() == []
+    
+    def test_end_date_with_cursor(self, auth_headers):
+        """Test paging with an end_date, given both with and without a timezone"""
+        now = datetime.now(timezone.utc)
+        for end_date in [now.isoformat(), now.replace(tzinfo=None).isoformat()]:
+            params = {"action": "user_login", "end_date": end_date, "limit": 2}
+            response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params=params)
+            assert response.status_code == 200, f"Failed: {response.text}"
+            first_page = response.json()
+            cursor = response.headers["X-Next-Cursor"]
+            
+            response = requests.get(f"{BASE_URL}/api/audit/logs", headers=auth_headers, params={**params, "cursor": cursor})
+            assert response.status_code == 200, f"Failed: {response.text}"
+            assert response.json()
+            assert not {log["id"] for log in first_page} & {log["id"] for log in response.json()}
+
+
+class TestAuditRetention:
+    """Retention and archive endpoint tests"""
+    
+    def test_metrics_expose_archiver(self, auth_headers):
+        """Test the archiver reports its retention settings"""
+        response = requests.get(f"{BASE_URL}/api/admin/metrics", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        stats = response.json()["audit_archiver"]
+        for key in ["enabled", "running", "lease_held", "retention_days", "archived", "last_run"]:
+            assert key in stats
+    
+    def test_archive_endpoints(self, auth_headers):
+        """Test archives are listed when archiving is enabled and malformed months rejected"""
+        response = requests.get(f"{BASE_URL}/api/audit/archives", headers=auth_headers)
+        if response.status_code == 404:
+            pytest.skip("Audit archiving is disabled (AUDIT_ARCHIVE_DIR not set)")
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert isinstance(response.json(), list)
+        
+        response = requests.get(f"{BASE_URL}/api/audit/archives/2024-13", headers=auth_headers)
+        assert response.status_code == 400
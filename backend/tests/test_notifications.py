@@ -0,0 +1,89 @@
+"""
+Backend API Tests for notifications
+Tests: Unread counter maintained on create, read and read-all
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials (admin user)
+TEST_EMAIL = "vadim@emergent.dev"
+TEST_PASSWORD = "admin123"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with admin auth token"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestUnreadCount:
+    """Unread counter tests"""
+    
+    def test_unread_count_follows_notifications(self, auth_headers):
+        """Test deleting a department notifies its head and the counter tracks reads"""
+        unique_id = str(uuid.uuid4())[:8]
+        response = requests.post(
+            f"{BASE_URL}/api/departments/faction/gov",
+            headers=auth_headers,
+            json={"name": f"TEST_Notify_{unique_id}"}
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        dept_id = response.json()["id"]
+        
+        email = f"TEST_notify_{unique_id}@test.com"
+        response = requests.post(
+            f"{BASE_URL}/api/admin/users",
+            headers=auth_headers,
+            json={
+                "email": email,
+                "password": "testpass123",
+                "full_name": f"TEST Notify {unique_id}",
+                "nickname": f"TEST_NotifyNick_{unique_id}",
+                "role": "head_of_department",
+                "faction": "gov",
+                "department_id": dept_id
+            }
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        
+        login_response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "testpass123"
+        })
+        assert login_response.status_code == 200
+        user_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        
+        response = requests.get(f"{BASE_URL}/api/notifications/unread-count", headers=user_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert response.json()["unread_count"] == 0
+        
+        response = requests.delete(f"{BASE_URL}/api/departments/{dept_id}", headers=auth_headers)
+        assert response.status_code == 200
+        
+        response = requests.get(f"{BASE_URL}/api/notifications/unread-count", headers=user_headers)
+        assert response.json()["unread_count"] == 1
+        
+        notifications = requests.get(f"{BASE_URL}/api/notifications/", headers=user_headers).json()
+        assert len(notifications) == 1
+        assert notifications[0]["type"] == "department_deleted"
+        
+        response = requests.post(f"{BASE_URL}/api/notifications/{notifications[0]['id']}/read", headers=user_headers)
+        assert response.status_code == 200
+        response = requests.get(f"{BASE_URL}/api/notifications/unread-count", headers=user_headers)
+        assert response.json()["unread_count"] == 0
+        
+        # Marking all as read keeps the counter at zero
+        response = requests.post(f"{BASE_URL}/api/notifications/read-all", headers=user_headers)
+        assert response.status_code == 200
+        response = requests.get(f"{BASE_URL}/api/notifications/unread-count", headers=user_headers)
+        assert response.json()["unread_count"] == 0
+        print(f"Unread counter followed notifications of {email}")
@@ -0,0 +1,83 @@
+"""
+Backend API Tests for the authenticated user (principal) cache
+Tests: Cache counters, Deactivation/activation take effect immediately
+"""
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials (admin user)
+TEST_EMAIL = "vadim@emergent.dev"
+TEST_PASSWORD = "admin123"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with admin auth token"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestPrincipalCache:
+    """Principal cache behaviour tests"""
+    
+    def test_metrics_expose_cache_counters(self, auth_headers):
+        """Test repeated requests are counted as cache hits"""
+        for _ in range(3):
+            response = requests.get(f"{BASE_URL}/api/auth/me", headers=auth_headers)
+            assert response.status_code == 200
+        
+        response = requests.get(f"{BASE_URL}/api/admin/metrics", headers=auth_headers)
+        assert response.status_code == 200, f"Failed: {response.text}"
+        stats = response.json()["principal_cache"]
+        
+        for key in ["hits", "misses", "size", "max_size", "ttl_seconds", "hit_ratio"]:
+            assert key in stats
+        assert stats["hits"] >= 2
+        print(f"Principal cache: {stats}")
+    
+    def test_deactivation_applies_immediately(self, auth_headers):
+        """Test a cached user is rejected right after deactivation"""
+        unique_id = str(uuid.uuid4())[:8]
+        email = f"TEST_cache_{unique_id}@test.com"
+        create_response = requests.post(
+            f"{BASE_URL}/api/admin/users",
+            headers=auth_headers,
+            json={
+                "email": email,
+                "password": "testpass123",
+                "full_name": f"TEST Cache {unique_id}",
+                "nickname": f"TEST_CacheNick_{unique_id}",
+                "role": "zgs"
+            }
+        )
+        assert create_response.status_code == 200
+        user_id = create_response.json()["id"]
+        
+        login_response = requests.post(f"{BASE_URL}/api/auth/login", json={
+            "email": email,
+            "password": "testpass123"
+        })
+        assert login_response.status_code == 200
+        user_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        
+        # Warm the cache
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers).status_code == 200
+        
+        # Deactivate - the cached principal must not outlive this
+        response = requests.delete(f"{BASE_URL}/api/admin/users/{user_id}", headers=auth_headers)
+        assert response.status_code == 200
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers).status_code == 403
+        
+        # Activate again
+        response = requests.post(f"{BASE_URL}/api/admin/users/{user_id}/activate", headers=auth_headers)
+        assert response.status_code == 200
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=user_headers).status_code == 200
+        print(f"Deactivation/activation of {user_id} applied immediately")
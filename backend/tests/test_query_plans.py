@@ -0,0 +1,314 @@
+"""
+Query plan regression tests
+Tests: Every query issued while driving the routers is explained and must use an
+index - no COLLSCAN and no in-memory SORT in the winning plan, and every $lookup
+must find its foreign documents through an index
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017); skipped otherwise.
+The app runs in-process against a throwaway database.
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import config
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = f"test_query_plans_{uuid.uuid4().hex[:8]}"
+
+# Test credentials (seeded developer user)
+TEST_EMAIL = "vadim@emergent.dev"
+TEST_PASSWORD = "admin123"
+
+# Commands whose filter can be explained, with the part of the command that holds it
+EXPLAINABLE = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes",
+    "findAndModify": "query",
+}
+
+# Stages that mean the query was not answered from an index
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+# Join strategy of a pushed-down $lookup (EQ_LOOKUP) that probes an index on the foreign side
+INDEXED_JOIN = "IndexedLoopJoin"
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """Record the queries the application sends to the test database"""
+    
+    def __init__(self):
+        self.commands = []
+    
+    def started(self, event):
+        if event.database_name == DB_NAME and event.command_name in EXPLAINABLE:
+            self.commands.append(dict(event.command))
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+
+def is_unfiltered(command: dict) -> bool:
+    """Whole-collection reads (listing all factions, counting users...) are scans by design"""
+    name = next(iter(command))
+    if name == "find":
+        return not command.get("filter") and not command.get("sort")
+    if name == "aggregate":
+        first = command["pipeline"][0] if command["pipeline"] else {}
+        return not first.get("$match") and "$sort" not in first
+    return False
+
+
+def explainable(command: dict) -> list:
+    """Commands to wrap in explain: driver session fields stripped, write batches split per statement"""
+    command = {
+        key: value for key, value in command.items()
+        if not key.startswith("$") and key not in ("lsid", "txnNumber", "writeConcern", "readConcern", "ordered")
+    }
+    name = next(iter(command))
+    if name in ("update", "delete"):
+        field = EXPLAINABLE[name]
+        return [{**command, field: [statement]} for statement in command.get(field, [])]
+    return [command]
+
+
+def lookup_queries(command: dict) -> list:
+    """Foreign-side equality query of each $lookup in an aggregate, as a find to explain on its own"""
+    if next(iter(command)) != "aggregate":
+        return []
+    queries = []
+    for stage in command.get("pipeline", []):
+        lookup = stage.get("$lookup")
+        if lookup and "foreignField" in lookup:
+            queries.append({"find": lookup["from"], "filter": {lookup["foreignField"]: "TEST_lookup_key"}})
+    return queries
+
+
+def winning_stages(explain) -> set:
+    """Stage names of every winning plan in an explain result (find, write or aggregate)"""
+    stages = set()
+    
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.add(node["stage"])
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                walk(value, in_plan or key in ("winningPlan", "queryPlan"))
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+    
+    walk(explain, False)
+    return stages
+
+
+def lookup_strategies(explain) -> set:
+    """Join strategies of the EQ_LOOKUP stages in an explain result (empty when $lookup was not pushed down)"""
+    strategies = set()
+    
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("stage") == "EQ_LOOKUP":
+                strategies.add(node.get("strategy"))
+            for key, value in node.items():
+                if key != "rejectedPlans":
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+    
+    walk(explain)
+    return strategies
+
+
+@pytest.fixture(scope="module")
+def mongo():
+    """Synchronous client for seeding and explain; skip when there is no mongod"""
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No MongoDB server at {MONGO_URL}")
+    yield client[DB_NAME]
+    client.drop_database(DB_NAME)
+    client.close()
+
+
+@pytest.fixture(scope="module")
+def recorder():
+    """Register the listener before the app creates its client"""
+    listener = QueryRecorder()
+    monitoring.register(listener)
+    return listener
+
+
+@pytest.fixture(scope="module")
+def client(mongo, recorder):
+    """The API running in-process against the throwaway database"""
+    from database import close_db, connect_db
+    from routes import admin, audit, auth, departments, factions, notifications, senior_staff, topics, weeks
+    from utils.factions import faction_registry
+    from utils.security import hash_password
+    
+    mongo.users.insert_one({
+        "id": str(uuid.uuid4()),
+        "email": TEST_EMAIL,
+        "password_hash": hash_password(TEST_PASSWORD),
+        "full_name": "Vadim Smirnov",
+        "nickname": "TEST_Vadim",
+        "role": "developer",
+        "faction": None,
+        "department_id": None,
+        "is_active": True,
+        "two_fa_enabled": False,
+        "created_at": datetime.now(timezone.utc)
+    })
+    
+    config.MONGO_URL = MONGO_URL
+    config.DB_NAME = DB_NAME
+    
+    app = FastAPI()
+    api_router = APIRouter(prefix="/api")
+    for module in [auth, factions, departments, weeks, topics, notifications, audit, admin, senior_staff]:
+        api_router.include_router(module.router)
+    app.include_router(api_router)
+    
+    @app.on_event("startup")
+    async def startup():
+        await connect_db()
+        await faction_registry.load()
+    
+    @app.on_event("shutdown")
+    async def shutdown():
+        await close_db()
+    
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="module")
+def auth_headers(client):
+    """Get headers with developer auth token"""
+    response = client.post("/api/auth/login", json={"email": TEST_EMAIL, "password": TEST_PASSWORD})
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def drive_routes(client, headers):
+    """Exercise the read and write paths of every router"""
+    def call(method, url, extra_headers=None, **kwargs):
+        response = client.request(method, url, headers={**headers, **(extra_headers or {})}, **kwargs)
+        assert response.status_code < 500, f"{method} {url} failed: {response.text}"
+        return response
+    
+    call("POST", "/api/factions/initialize")
+    call("GET", "/api/factions/")
+    call("GET", "/api/factions/gov")
+    call("GET", "/api/auth/me")
+    
+    dept_id = call("POST", "/api/departments/faction/gov", json={"name": "TEST_Plans"}).json()["id"]
+    call("GET", f"/api/departments/{dept_id}")
+    call("GET", "/api/departments/faction/gov")
+    call("PUT", f"/api/departments/{dept_id}", json={"name": "TEST_Plans_Renamed"})
+    
+    week = call("GET", f"/api/weeks/department/{dept_id}/current").json()
+    call("GET", f"/api/weeks/department/{dept_id}")
+    table = call("GET", f"/api/weeks/{week['id']}/table-data")
+    call("PUT", f"/api/weeks/{week['id']}/table-data", extra_headers={"If-Match": table.headers["ETag"]},
+         json={"rows": [{"employee_name": "TEST_Ivanov", "cells": {"Пн": False}}]})
+    call("PATCH", f"/api/weeks/{week['id']}/table-data", json={"operations": [
+        {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "Пн", "value": True}
+    ]})
+    
+    for kind in ["lectures", "trainings"]:
+        topic_id = call("POST", f"/api/topics/{kind}/faction/gov", json={"topic": "TEST_Topic"}).json()["id"]
+        call("GET", f"/api/topics/{kind}/faction/gov")
+        call("DELETE", f"/api/topics/{kind}/{topic_id}")
+        topic_id = call("POST", f"/api/topics/{kind}/department/{dept_id}", json={"topic": "TEST_Topic"}).json()["id"]
+        call("GET", f"/api/topics/{kind}/department/{dept_id}")
+        call("DELETE", f"/api/topics/{kind}/department/{dept_id}/{topic_id}")
+    
+    call("GET", "/api/senior-staff/faction/gov")
+    call("POST", "/api/senior-staff/faction/gov/row", json={"employee_name": "TEST_Staff"})
+    call("DELETE", "/api/senior-staff/faction/gov/row/0")
+    
+    user_id = call("POST", "/api/admin/users", json={
+        "email": "TEST_plans@test.com",
+        "password": "testpass123",
+        "full_name": "TEST Plans",
+        "nickname": "TEST_PlansNick",
+        "role": "head_of_department",
+        "faction": "gov",
+        "department_id": dept_id
+    }).json()["id"]
+    call("GET", "/api/admin/users", params={"faction": "gov"})
+    call("GET", "/api/admin/users", params={"role": "head_of_department", "is_active": True})
+    call("GET", f"/api/admin/users/{user_id}")
+    call("PUT", f"/api/admin/users/{user_id}", json={"full_name": "TEST Plans Renamed"})
+    call("GET", "/api/admin/departments-list", params={"faction": "gov"})
+    call("GET", "/api/admin/stats")
+    
+    call("DELETE", f"/api/departments/{dept_id}")
+    call("DELETE", f"/api/admin/users/{user_id}")
+    call("POST", f"/api/admin/users/{user_id}/activate")
+    
+    call("GET", "/api/notifications/")
+    call("GET", "/api/notifications/", params={"unread_only": True})
+    call("GET", "/api/notifications/unread-count")
+    call("POST", "/api/notifications/read-all")
+    
+    call("GET", "/api/audit/logs")
+    call("GET", "/api/audit/logs", params={"action": "department_deleted"})
+    call("GET", "/api/audit/logs", params={"resource_type": "department", "skip": 1})
+    call("GET", "/api/audit/logs", params={"user_id": user_id})
+    page = call("GET", "/api/audit/logs", params={"limit": 2})
+    call("GET", "/api/audit/logs", params={"limit": 2, "cursor": page.headers["X-Next-Cursor"]})
+    call("GET", "/api/audit/logs", params={"action": "user_login", "start_date": "2020-01-01T00:00:00+00:00"})
+
+
+class TestQueryPlans:
+    """Index usage of every route query"""
+    
+    def test_route_queries_use_indexes(self, mongo, recorder, client, auth_headers):
+        """Test no route query scans a collection or sorts in memory"""
+        drive_routes(client, auth_headers)
+        assert recorder.commands, "No queries were recorded"
+        
+        failures = []
+        explained = 0
+        for recorded in recorder.commands:
+            # Joins are checked even when the outer read is a whole-collection scan
+            commands = lookup_queries(recorded)
+            if not is_unfiltered(recorded):
+                commands = explainable(recorded) + commands
+            for command in commands:
+                result = mongo.command("explain", command, verbosity="queryPlanner")
+                explained += 1
+                
+                name = next(iter(command))
+                stages = winning_stages(result) & FORBIDDEN_STAGES
+                if stages:
+                    failures.append(f"{name} {command[name]} {command.get(EXPLAINABLE[name])}: {sorted(stages)}")
+                
+                joins = lookup_strategies(result) - {INDEXED_JOIN}
+                if joins:
+                    failures.append(f"{name} {command[name]} {command.get(EXPLAINABLE[name])}: $lookup joins {sorted(joins)}")
+        
+        assert not failures, "Queries without a usable index:\n" + "\n".join(failures)
+        print(f"Explained {explained} statements of {len(recorder.commands)} queries, all use indexes")
@@ -0,0 +1,150 @@
+"""
+Tests for Socket.IO authentication and room access
+Tests: Handshakes without a valid access token or from deactivated users are refused,
+department rooms are limited to viewers of the department's faction
+(in-process: the real handlers on a local test server with fixture users, no running backend needed)
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+import socketio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from jose import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import websocket_server
+from config import config
+from utils.access import AccessContext
+from utils.security import create_access_token, create_refresh_token
+
+EVENT_TIMEOUT = 2
+
+USERS = {
+    "TEST_gov_head": {"id": "TEST_gov_head", "role": "head_of_department", "faction": "gov", "is_active": True},
+    "TEST_inactive": {"id": "TEST_inactive", "role": "head_of_department", "faction": "gov", "is_active": False}
+}
+
+DEPARTMENTS = {
+    "TEST_gov_dept": AccessContext(department={"id": "TEST_gov_dept"}, faction={"code": "gov"}),
+    "TEST_fsb_dept": AccessContext(department={"id": "TEST_fsb_dept"}, faction={"code": "fsb"})
+}
+
+
+@pytest.fixture
+def socket_server(monkeypatch):
+    """Register the websocket_server handlers on an aiohttp server, with users and departments from fixtures"""
+    server = socketio.AsyncServer(async_mode='aiohttp')
+    monkeypatch.setattr(websocket_server, 'sio', server)
+    for event in ('connect', 'disconnect', 'join_department'):
+        server.on(event, getattr(websocket_server, event))
+    
+    async def get_principal(user_id):
+        return dict(USERS[user_id]) if user_id in USERS else None
+    
+    async def resolve_department_access(department_id):
+        return DEPARTMENTS[department_id]
+    
+    monkeypatch.setattr(websocket_server, 'get_principal', get_principal)
+    monkeypatch.setattr(websocket_server, 'resolve_department_access', resolve_department_access)
+    return server
+
+
+async def run_server(server, scenario):
+    """Serve the Socket.IO server, run scenario(url), then shut down"""
+    app = web.Application()
+    server.attach(app)
+    http = TestServer(app, host='127.0.0.1')
+    await http.start_server()
+    try:
+        return await scenario(str(http.make_url('/')))
+    finally:
+        await http.close()
+
+
+async def try_connect(url, token):
+    """Connect with a token; True if the handshake was accepted"""
+    client = socketio.AsyncClient()
+    try:
+        await client.connect(url, auth={'token': token}, transports=['websocket'])
+    except socketio.exceptions.ConnectionError:
+        return False
+    await client.disconnect()
+    return True
+
+
+async def wait_until(condition):
+    """Poll until condition() holds or the timeout passes"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENT_TIMEOUT
+    while not condition() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestSocketAuth:
+    """Handshake authentication and department room tests"""
+    
+    def test_connect_requires_access_token(self, socket_server):
+        """Test missing, invalid and refresh tokens are refused while an access token is accepted"""
+        refresh_jwt = jwt.encode({"user_id": "TEST_gov_head", "type": "refresh"}, config.JWT_SECRET, algorithm=config.JWT_ALGORITHM)
+        tokens = {
+            "missing": None,
+            "invalid": "not-a-token",
+            "refresh": create_refresh_token(),
+            "refresh_jwt": refresh_jwt,
+            "unknown_user": create_access_token({"user_id": "TEST_nobody"}),
+            "access": create_access_token({"user_id": "TEST_gov_head"})
+        }
+        
+        async def scenario(url):
+            return {name: await try_connect(url, token) for name, token in tokens.items()}
+        
+        accepted = asyncio.run(run_server(socket_server, scenario))
+        assert accepted == {
+            "missing": False,
+            "invalid": False,
+            "refresh": False,
+            "refresh_jwt": False,
+            "unknown_user": False,
+            "access": True
+        }
+        assert websocket_server.sessions == {}
+    
+    def test_deactivated_user_is_refused(self, socket_server):
+        """Test a valid access token of a deactivated user does not open a connection"""
+        async def scenario(url):
+            return await try_connect(url, create_access_token({"user_id": "TEST_inactive"}))
+        
+        assert asyncio.run(run_server(socket_server, scenario)) is False
+    
+    def test_join_department_of_other_faction(self, socket_server):
+        """Test joining another faction's department emits error and leaves the client out of the room"""
+        async def scenario(url):
+            client = socketio.AsyncClient()
+            errors = []
+            client.on('error', lambda data: errors.append(data))
+            await client.connect(url, auth={'token': create_access_token({"user_id": "TEST_gov_head"})}, transports=['websocket'])
+            try:
+                sid = client.get_sid()
+                
+                await client.emit('join_department', {'department_id': 'TEST_fsb_dept'})
+                await wait_until(lambda: errors)
+                foreign_rooms = socket_server.rooms(sid)
+                
+                await client.emit('join_department', {'department_id': 'TEST_gov_dept'})
+                await wait_until(lambda: 'department_TEST_gov_dept' in socket_server.rooms(sid))
+                own_rooms = socket_server.rooms(sid)
+                session_rooms = set(websocket_server.sessions[sid]['rooms'])
+            finally:
+                await client.disconnect()
+            return errors, foreign_rooms, own_rooms, session_rooms
+        
+        errors, foreign_rooms, own_rooms, session_rooms = asyncio.run(run_server(socket_server, scenario))
+        assert errors == [{'message': "You don't have permission to view this department"}]
+        assert 'department_TEST_fsb_dept' not in foreign_rooms
+        assert 'department_TEST_gov_dept' in own_rooms
+        assert 'department_TEST_fsb_dept' not in own_rooms
+        assert session_rooms == {'TEST_gov_dept'}
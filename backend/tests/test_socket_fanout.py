@@ -0,0 +1,138 @@
+"""
+Tests for Socket.IO fan-out between workers
+Tests: Room emits and user notifications reach clients connected to another server
+through the pub/sub client manager (in-process broker and local test servers,
+no running backend needed)
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+import socketio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.socket_manager import AsyncInProcessManager, InProcessBroker, control_handlers, create_client_manager, on_control_message
+
+EVENT_TIMEOUT = 2
+
+
+async def start_worker(broker):
+    """Serve a Socket.IO server as one worker would; clients join the rooms they ask for"""
+    server = socketio.AsyncServer(async_mode='aiohttp', client_manager=AsyncInProcessManager(broker=broker))
+    
+    @server.event
+    async def connect(sid, environ, auth):
+        for room in auth.get('rooms', []):
+            await server.enter_room(sid, room)
+    
+    app = web.Application()
+    server.attach(app)
+    http = TestServer(app, host='127.0.0.1')
+    await http.start_server()
+    return server, http
+
+
+async def connect_client(http, rooms, events):
+    """Connect a client to a worker, recording every event it receives"""
+    client = socketio.AsyncClient()
+    received = []
+    for event in events:
+        client.on(event, lambda data, event=event: received.append((event, data)))
+    await client.connect(str(http.make_url('/')), auth={'rooms': rooms}, transports=['websocket'])
+    return client, received
+
+
+async def wait_until(condition):
+    """Poll until condition() holds or the timeout passes"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENT_TIMEOUT
+    while not condition() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def run_workers(scenario):
+    """Start two workers sharing a broker, run scenario(worker_a, worker_b), then shut everything down"""
+    broker = InProcessBroker()
+    worker_a, http_a = await start_worker(broker)
+    worker_b, http_b = await start_worker(broker)
+    clients = []
+    try:
+        return await scenario((worker_a, http_a, clients), (worker_b, http_b, clients))
+    finally:
+        for client in clients:
+            await client.disconnect()
+        await http_a.close()
+        await http_b.close()
+
+
+class TestSocketFanout:
+    """Cross-worker delivery tests"""
+    
+    def test_room_emit_reaches_other_worker(self):
+        """Test a table update emitted on worker A reaches a viewer on worker B"""
+        async def scenario(a, b):
+            worker_a, _, clients = a
+            _, http_b, _ = b
+            viewer, viewer_events = await connect_client(http_b, ['department_d1'], ['table_updated'])
+            other, other_events = await connect_client(http_b, ['department_d2'], ['table_updated'])
+            clients.extend([viewer, other])
+            
+            await worker_a.emit('table_updated', {'department_id': 'd1', 'version': 2}, room='department_d1')
+            await wait_until(lambda: viewer_events)
+            await asyncio.sleep(0.05)
+            return viewer_events, other_events
+        
+        viewer_events, other_events = asyncio.run(run_workers(scenario))
+        assert viewer_events == [('table_updated', {'department_id': 'd1', 'version': 2})]
+        assert other_events == []
+    
+    def test_user_notification_reaches_other_worker(self):
+        """Test notifications addressed to a user's room are delivered on every worker they use"""
+        async def scenario(a, b):
+            worker_a, http_a, clients = a
+            _, http_b, _ = b
+            tab_a, events_a = await connect_client(http_a, ['user_u1'], ['notification'])
+            tab_b, events_b = await connect_client(http_b, ['user_u1'], ['notification'])
+            clients.extend([tab_a, tab_b])
+            
+            await worker_a.emit('notification', {'title': 'TEST'}, room='user_u1')
+            await wait_until(lambda: events_a and events_b)
+            return events_a, events_b
+        
+        events_a, events_b = asyncio.run(run_workers(scenario))
+        assert events_a == [('notification', {'title': 'TEST'})]
+        assert events_b == [('notification', {'title': 'TEST'})]
+    
+    def test_control_message_reaches_other_workers(self):
+        """Test control messages (cache invalidations) are handled by the other workers only"""
+        received = []
+        on_control_message('TEST_invalidate')(lambda data: received.append(data['user_id']))
+        
+        async def scenario(a, b):
+            worker_a, _, clients = a
+            _, http_b, _ = b
+            client, events = await connect_client(http_b, ['user_u1'], ['TEST_invalidate'])
+            clients.append(client)
+            
+            await worker_a.manager.publish_control('TEST_invalidate', {'user_id': 'u1'})
+            await wait_until(lambda: received)
+            await asyncio.sleep(0.05)
+            return events
+        
+        try:
+            events = asyncio.run(run_workers(scenario))
+        finally:
+            control_handlers.pop('TEST_invalidate', None)
+        assert received == ['u1']
+        assert events == []
+    
+    def test_create_client_manager(self):
+        """Test message queue URLs map to the right managers"""
+        assert create_client_manager('') is None
+        assert isinstance(create_client_manager('local://'), AsyncInProcessManager)
+        with pytest.raises(ValueError):
+            create_client_manager('ftp://nowhere')
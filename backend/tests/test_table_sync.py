@@ -0,0 +1,275 @@
+"""
+Backend API Tests for weekly table data synchronisation
+Tests: Cell-level PATCH operations, Optimistic concurrency (If-Match/409), Conditional GET (304),
+Race-free current week creation
+"""
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Test credentials (admin user)
+TEST_EMAIL = "vadim@emergent.dev"
+TEST_PASSWORD = "admin123"
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get headers with admin auth token"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def department_id(auth_headers):
+    """Create a throwaway department and delete it afterwards"""
+    response = requests.post(
+        f"{BASE_URL}/api/departments/faction/gov",
+        headers=auth_headers,
+        json={"name": f"TEST_Sync_{str(uuid.uuid4())[:8]}"}
+    )
+    assert response.status_code == 200, f"Failed: {response.text}"
+    dept_id = response.json()["id"]
+    yield dept_id
+    requests.delete(f"{BASE_URL}/api/departments/{dept_id}", headers=auth_headers)
+
+
+@pytest.fixture(scope="module")
+def week_id(auth_headers, department_id):
+    """Get current week of the throwaway department"""
+    response = requests.get(f"{BASE_URL}/api/weeks/department/{department_id}/current", headers=auth_headers)
+    assert response.status_code == 200, f"Failed: {response.text}"
+    return response.json()["id"]
+
+
+def get_rows(auth_headers, week_id):
+    response = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers)
+    assert response.status_code == 200, f"Failed: {response.text}"
+    return {row["employee_name"]: row["cells"] for row in response.json()["rows"]}
+
+
+class TestTableDataPatch:
+    """Cell-level PATCH endpoint tests"""
+    
+    def test_patch_operations(self, auth_headers, week_id):
+        """Test add row, set cell, rename and remove in one batch"""
+        response = requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers=auth_headers,
+            json={"operations": [
+                {"op": "add_row", "row": {"employee_name": "TEST_Ivanov", "cells": {"Пн": False}}},
+                {"op": "add_row", "row": {"employee_name": "TEST_Petrov", "cells": {"Пн": False}}},
+                {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "Пн", "value": True},
+                {"op": "rename_employee", "employee_name": "TEST_Petrov", "new_name": "TEST_Sidorov"},
+                {"op": "set_cell", "employee_name": "TEST_Sidorov", "column": "Вт", "value": True}
+            ]}
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert response.json()["operations"] == 5
+        
+        rows = get_rows(auth_headers, week_id)
+        assert rows["TEST_Ivanov"]["Пн"] is True
+        assert rows["TEST_Sidorov"] == {"Пн": False, "Вт": True}
+        assert "TEST_Petrov" not in rows
+        
+        response = requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers=auth_headers,
+            json={"operations": [{"op": "remove_row", "employee_name": "TEST_Sidorov"}]}
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        assert list(get_rows(auth_headers, week_id)) == ["TEST_Ivanov"]
+        print("PATCH operations applied")
+    
+    def test_patch_rejects_invalid_operations(self, auth_headers, week_id):
+        """Test unknown operations and unsafe column keys are rejected"""
+        for operation in [
+            {"op": "drop_table"},
+            {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "a.b", "value": 1},
+            {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "$where", "value": 1},
+            {"op": "rename_employee", "employee_name": "TEST_Ivanov"}
+        ]:
+            response = requests.patch(
+                f"{BASE_URL}/api/weeks/{week_id}/table-data",
+                headers=auth_headers,
+                json={"operations": [operation]}
+            )
+            assert response.status_code == 400, f"Expected 400 for {operation}: {response.text}"
+        print("Invalid operations rejected")
+    
+    def test_patch_unknown_employee_changes_nothing(self, auth_headers, week_id):
+        """Test a batch naming an employee without a row is rejected as a whole"""
+        before = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers).json()
+        
+        response = requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers=auth_headers,
+            json={"operations": [
+                {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "Ср", "value": True},
+                {"op": "set_cell", "employee_name": "TEST_Nobody", "column": "Ср", "value": True}
+            ]}
+        )
+        assert response.status_code == 422, f"Expected 422: {response.text}"
+        
+        after = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers).json()
+        assert after["version"] == before["version"]
+        assert after["rows"] == before["rows"]
+    
+    def test_patch_removed_employee_in_same_batch(self, auth_headers, week_id):
+        """Test a batch editing a row it removed earlier is rejected as a whole"""
+        before = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers).json()
+        
+        response = requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers=auth_headers,
+            json={"operations": [
+                {"op": "remove_row", "employee_name": "TEST_Ivanov"},
+                {"op": "set_cell", "employee_name": "TEST_Ivanov", "column": "Ср", "value": True}
+            ]}
+        )
+        assert response.status_code == 422, f"Expected 422: {response.text}"
+        
+        after = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers).json()
+        assert after["version"] == before["version"]
+        assert after["rows"] == before["rows"]
+    
+    def test_patch_unknown_week(self, auth_headers):
+        """Test patching a non-existent week"""
+        response = requests.patch(
+            f"{BASE_URL}/api/weeks/nonexistent-week/table-data",
+            headers=auth_headers,
+            json={"operations": []}
+        )
+        assert response.status_code == 404
+
+
+class TestTableDataVersioning:
+    """Optimistic concurrency tests"""
+    
+    def test_get_returns_version_and_etag(self, auth_headers, week_id):
+        """Test table data carries a version and matching ETag"""
+        response = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers)
+        assert response.status_code == 200
+        version = response.json()["version"]
+        assert response.headers["ETag"] == f'"v{version}"'
+    
+    def test_stale_write_is_rejected(self, auth_headers, week_id):
+        """Test two writers starting from the same version: the second gets 409"""
+        response = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers)
+        etag = response.headers["ETag"]
+        rows = response.json()["rows"]
+        
+        first = requests.put(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers={**auth_headers, "If-Match": etag},
+            json={"rows": rows}
+        )
+        assert first.status_code == 200, f"Failed: {first.text}"
+        assert first.headers["ETag"] != etag
+        
+        second = requests.put(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers={**auth_headers, "If-Match": etag},
+            json={"rows": []}
+        )
+        assert second.status_code == 409, f"Expected conflict: {second.text}"
+        
+        stale_patch = requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers={**auth_headers, "If-Match": etag},
+            json={"operations": [{"op": "remove_row", "employee_name": "TEST_Ivanov"}]}
+        )
+        assert stale_patch.status_code == 409
+        
+        # Writing against the fresh version succeeds
+        fresh = requests.put(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers={**auth_headers, "If-Match": first.headers["ETag"]},
+            json={"rows": rows}
+        )
+        assert fresh.status_code == 200, f"Failed: {fresh.text}"
+        assert fresh.json()["version"] == first.json()["version"] + 1
+        print("Stale writes rejected with 409")
+    
+    def test_malformed_if_match(self, auth_headers, week_id):
+        """Test malformed If-Match header is rejected"""
+        response = requests.put(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers={**auth_headers, "If-Match": '"garbage"'},
+            json={"rows": []}
+        )
+        assert response.status_code == 400
+
+
+class TestConditionalGet:
+    """ETag / If-None-Match revalidation tests"""
+    
+    def test_unchanged_resources_return_304(self, auth_headers, department_id, week_id):
+        """Test revalidating with the current ETag returns an empty 304"""
+        for url in [
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            f"{BASE_URL}/api/weeks/department/{department_id}",
+            f"{BASE_URL}/api/topics/lectures/department/{department_id}",
+            f"{BASE_URL}/api/topics/trainings/department/{department_id}",
+            f"{BASE_URL}/api/departments/{department_id}"
+        ]:
+            response = requests.get(url, headers=auth_headers)
+            assert response.status_code == 200, f"Failed {url}: {response.text}"
+            etag = response.headers.get("ETag")
+            assert etag, f"No ETag for {url}"
+            
+            cached = requests.get(url, headers={**auth_headers, "If-None-Match": etag})
+            assert cached.status_code == 304, f"Expected 304 for {url}, got {cached.status_code}"
+            assert cached.content == b""
+        print("Unchanged resources revalidated with 304")
+    
+    def test_changed_table_returns_200(self, auth_headers, week_id):
+        """Test a write invalidates the table data ETag"""
+        response = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers=auth_headers)
+        etag = response.headers["ETag"]
+        
+        requests.patch(
+            f"{BASE_URL}/api/weeks/{week_id}/table-data",
+            headers=auth_headers,
+            json={"operations": [{"op": "add_row", "row": {"employee_name": "TEST_Etag", "cells": {}}}]}
+        )
+        
+        response = requests.get(f"{BASE_URL}/api/weeks/{week_id}/table-data", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+class TestCurrentWeekCreation:
+    """Concurrent current week creation tests"""
+    
+    def test_concurrent_requests_create_one_week(self, auth_headers):
+        """Test several users opening a new department at once get the same week"""
+        response = requests.post(
+            f"{BASE_URL}/api/departments/faction/gov",
+            headers=auth_headers,
+            json={"name": f"TEST_Race_{str(uuid.uuid4())[:8]}"}
+        )
+        assert response.status_code == 200, f"Failed: {response.text}"
+        dept_id = response.json()["id"]
+        
+        try:
+            url = f"{BASE_URL}/api/weeks/department/{dept_id}/current"
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                responses = list(pool.map(lambda _: requests.get(url, headers=auth_headers), range(8)))
+            
+            assert all(r.status_code == 200 for r in responses)
+            assert len({r.json()["id"] for r in responses}) == 1
+            
+            weeks = requests.get(f"{BASE_URL}/api/weeks/department/{dept_id}", headers=auth_headers).json()
+            assert len(weeks) == 1
+            assert weeks[0]["is_current"] is True
+            print(f"8 concurrent requests created a single week {weeks[0]['id']}")
+        finally:
+            requests.delete(f"{BASE_URL}/api/departments/{dept_id}", headers=auth_headers)
@@ -0,0 +1,96 @@
+from fastapi import HTTPException, status
+from database import get_db
+from typing import Optional, Tuple
+
+class AccessContext:
+    """Week (when resolved from one), department and faction behind a request"""
+    
+    def __init__(self, department: dict, faction: Optional[dict], week: Optional[dict] = None):
+        self.week = week
+        self.department = department
+        self.faction = faction
+    
+    @property
+    def faction_code(self) -> str:
+        """Code of the faction, for permission checks (404 if the faction document is missing)"""
+        if not self.faction:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Faction not found"
+            )
+        return self.faction['code']
+
+async def find_with_faction(collection, query: dict) -> Optional[Tuple[dict, Optional[dict]]]:
+    """Find one document and join its faction (by faction_id) in the same round trip"""
+    result = await collection.aggregate([
+        {"$match": query},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "factions",
+            "localField": "faction_id",
+            "foreignField": "id",
+            "as": "faction"
+        }},
+        {"$project": {"_id": 0, "faction._id": 0}}
+    ]).to_list(1)
+    
+    if not result:
+        return None
+    
+    document = result[0]
+    factions = document.pop('faction')
+    return document, factions[0] if factions else None
+
+async def resolve_department_access(department_id: str) -> AccessContext:
+    """Load department and its faction in one round trip (404 if the department is missing)"""
+    db = get_db()
+    
+    result = await find_with_faction(db.departments, {"id": department_id})
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Department not found"
+        )
+    
+    department, faction = result
+    return AccessContext(department=department, faction=faction)
+
+async def resolve_week_access(week_id: str) -> AccessContext:
+    """Load week, its department and faction in one round trip (404 if the week is missing)"""
+    db = get_db()
+    
+    result = await db.weeks.aggregate([
+        {"$match": {"id": week_id}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "departments",
+            "localField": "department_id",
+            "foreignField": "id",
+            "as": "department"
+        }},
+        {"$unwind": {"path": "$department", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "factions",
+            "localField": "department.faction_id",
+            "foreignField": "id",
+            "as": "faction"
+        }},
+        {"$project": {"_id": 0, "department._id": 0, "faction._id": 0}}
+    ]).to_list(1)
+    
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Week not found"
+        )
+    
+    week = result[0]
+    department = week.pop('department', None)
+    if not department:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Department not found"
+        )
+    
+    factions = week.pop('faction')
+    return AccessContext(week=week, department=department, faction=factions[0] if factions else None)
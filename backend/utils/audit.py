@@ -1,7 +1,172 @@
 from datetime import datetime, timezone
 from database import get_db
 from models import AuditLog
-from typing import Optional, Dict, Any
+from config import config
+from pymongo.errors import AutoReconnect, BulkWriteError
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import base64
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Queue marker telling the flusher to exit
+_STOP = object()
+
+class AuditWriter:
+    """Write-behind audit pipeline.
+    
+    Entries are queued in memory and written with insert_many once
+    AUDIT_BATCH_SIZE entries are waiting or AUDIT_FLUSH_INTERVAL_SECONDS has
+    passed. A full queue makes log_action wait (backpressure) rather than drop
+    entries. Connection errors are retried with backoff up to max_attempts
+    times; entries that still fail, or that the server rejects, are logged in
+    full (dead letters) and dropped so the flusher never stalls on them.
+    """
+    
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int, max_attempts: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.flushes = 0
+        self.retries = 0
+        self.dropped = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+    
+    def start(self):
+        """Start the background flusher (call from the app startup hook)"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("Audit writer started")
+    
+    async def stop(self, timeout: float = None):
+        """Flush everything still queued and stop (call from the app shutdown hook)"""
+        if self._task is None:
+            return
+        
+        # New entries are written inline from here on; queued ones are flushed first
+        self._stopping = True
+        self._batch_ready.set()
+        try:
+            await asyncio.wait_for(self._queue.put(_STOP), timeout=timeout)
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Audit writer drain timed out, {self._queue.qsize()} entries not written")
+            self._task.cancel()
+        self._task = None
+        logger.info("Audit writer stopped")
+    
+    async def enqueue(self, doc: dict):
+        """Queue an entry, waiting while the queue is full"""
+        await self._queue.put(doc)
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                return
+            
+            # Give concurrent requests a chance to join this batch
+            if self._queue.qsize() + 1 < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if not self._stopping:
+                self._batch_ready.clear()
+            
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                doc = self._queue.get_nowait()
+                if doc is _STOP:
+                    stop = True
+                    break
+                batch.append(doc)
+            
+            await self._write(batch)
+            if stop:
+                return
+    
+    async def _write(self, batch: List[dict]):
+        """Insert a batch, retrying connection errors with backoff and dropping rejected entries"""
+        db = get_db()
+        attempt = 0
+        
+        while batch:
+            attempt += 1
+            try:
+                await db.audit_logs.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                batch = []
+            except BulkWriteError as e:
+                # Duplicates were stored by an earlier attempt; other write errors won't pass on retry
+                rejected = {
+                    error['index']: error for error in e.details.get('writeErrors', [])
+                    if error.get('code') != DUPLICATE_KEY_ERROR
+                }
+                for index, error in rejected.items():
+                    self._drop(batch[index], f"code {error.get('code')}: {error.get('errmsg')}")
+                self.written += len(batch) - len(rejected)
+                batch = []
+            except AutoReconnect as e:
+                if attempt >= self.max_attempts:
+                    for doc in batch:
+                        self._drop(doc, f"gave up after {attempt} attempts: {e}")
+                    batch = []
+                else:
+                    logger.error(f"Audit log write failed, retrying {len(batch)} entries: {e}")
+                    self.retries += 1
+                    await asyncio.sleep(min(2 ** attempt * 0.1, 30))
+            except Exception as e:
+                for doc in batch:
+                    self._drop(doc, str(e))
+                batch = []
+        
+        self.flushes += 1
+    
+    def _drop(self, doc: dict, reason: str):
+        """Dead letter: keep the entry in the error log since it won't reach the database"""
+        self.dropped += 1
+        entry = json.dumps(doc, default=str, ensure_ascii=False)
+        logger.error(f"Dropped audit entry ({reason}): {entry}")
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "written": self.written,
+            "flushes": self.flushes,
+            "retries": self.retries,
+            "dropped": self.dropped
+        }
+
+audit_writer = AuditWriter(
+    batch_size=config.AUDIT_BATCH_SIZE,
+    flush_interval=config.AUDIT_FLUSH_INTERVAL_SECONDS,
+    max_queue_size=config.AUDIT_QUEUE_MAX_SIZE,
+    max_attempts=config.AUDIT_WRITE_MAX_ATTEMPTS
+)
 
 async def log_action(
     user_id: str,
@@ -14,7 +179,7 @@ async def log_action(
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None
 ):
-    """Log an action to the audit log"""
+    """Log an action to the audit log (written in the background when the app is running)"""
     db = get_db()
     
     log_entry = AuditLog(
@@ -30,9 +195,35 @@ async def log_action(
     )
     
     doc = log_entry.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
     
-    await db.audit_logs.insert_one(doc)
+    if audit_writer.running:
+        await audit_writer.enqueue(doc)
+    else:
+        # Scripts and tests without the app lifecycle write inline
+        await db.audit_logs.insert_one(doc)
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Make a datetime timezone-aware, reading naive values as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def encode_audit_cursor(log: dict) -> str:
+    """Opaque cursor pointing just after `log` in (timestamp, id) descending order"""
+    payload = json.dumps({"t": log['timestamp'].isoformat(), "id": log['id']})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_audit_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Read (timestamp, id) back from a cursor, ValueError if it is not one of ours"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        timestamp = as_utc(datetime.fromisoformat(payload['t']))
+        log_id = payload['id']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(log_id, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, log_id
 
 async def get_audit_logs(
     skip: int = 0,
@@ -41,10 +232,20 @@ async def get_audit_logs(
     resource_type: Optional[str] = None,
     action: Optional[str] = None,
     start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None
-):
-    """Retrieve audit logs with filters"""
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Retrieve audit logs with filters, newest first.
+    
+    Pages are read with a keyset on (timestamp, id) so that deep pages cost
+    the same as the first one. Returns (logs, next_cursor); next_cursor is
+    None on the last page. Naive dates are read as UTC. Raises ValueError
+    for an invalid cursor or for skip combined with a cursor.
+    """
     db = get_db()
+    if cursor and skip:
+        raise ValueError("skip can't be combined with cursor")
+    start_date, end_date = as_utc(start_date), as_utc(end_date)
     
     query = {}
     if user_id:
@@ -56,15 +257,26 @@ async def get_audit_logs(
     if start_date or end_date:
         query['timestamp'] = {}
         if start_date:
-            query['timestamp']['$gte'] = start_date.isoformat()
+            query['timestamp']['$gte'] = start_date
         if end_date:
-            query['timestamp']['$lte'] = end_date.isoformat()
-    
-    logs = await db.audit_logs.find(query, {"_id": 0}).sort("timestamp", -1).skip(skip).limit(limit).to_list(limit)
+            query['timestamp']['$lte'] = end_date
+    if cursor:
+        timestamp, log_id = decode_audit_cursor(cursor)
+        # (timestamp, id) < cursor, written as a range on timestamp so the index bounds the scan
+        bounds = query.setdefault('timestamp', {})
+        bounds['$lte'] = min(bounds.get('$lte', timestamp), timestamp)
+        query['$or'] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"id": {"$lt": log_id}}
+        ]
     
-    # Convert ISO strings to datetime
-    for log in logs:
-        if isinstance(log['timestamp'], str):
-            log['timestamp'] = datetime.fromisoformat(log['timestamp'])
+    # One extra row tells whether there is a next page
+    logs = await db.audit_logs.find(query, {"_id": 0}).sort(
+        [("timestamp", -1), ("id", -1)]
+    ).skip(skip).limit(limit + 1).to_list(limit + 1)
     
-    return logs
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_audit_cursor(logs[-1])
+    return logs, next_cursor
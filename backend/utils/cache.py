@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a fixed TTL.
+    
+    Not thread-safe: intended to be used from the event loop only.
+    """
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Bumped on every invalidation so in-flight loads can detect staleness
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return cached value or None if missing/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def generation(self) -> int:
+        """Snapshot to pass to set() when the value is loaded asynchronously"""
+        return self._generation
+    
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Store value, unless an invalidation happened since `generation`"""
+        if generation is not None and generation != self._generation:
+            return
+        
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop all entries"""
+        self._generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,74 @@
+from fastapi import HTTPException, Request, Response, status
+from typing import Optional
+import hashlib
+import json
+
+def version_etag(version: int) -> str:
+    """Strong ETag for a versioned document"""
+    return f'"v{version}"'
+
+def content_etag(*parts) -> str:
+    """Strong ETag derived from the stored documents (ids, timestamps, versions)"""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return f'"{hashlib.sha1(payload.encode()).hexdigest()}"'
+
+def set_etag(response: Response, etag: str):
+    """Attach ETag and make browsers revalidate instead of re-downloading"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check If-None-Match against the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    
+    # If-None-Match uses weak comparison
+    tags = [tag.strip() for tag in header.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+def not_modified_response(etag: str) -> Response:
+    """Empty 304 response carrying the current ETag"""
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """Extract the expected document version from an If-Match header.
+    
+    Returns None when the header is absent or '*' (unconditional write).
+    Raises ValueError for anything that is not one of our version ETags.
+    """
+    if not value or value.strip() == '*':
+        return None
+    
+    tag = value.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    if tag.startswith('v'):
+        tag = tag[1:]
+    
+    try:
+        return int(tag)
+    except ValueError:
+        raise ValueError(f"Invalid If-Match header: {value}")
+
+def get_expected_version(if_match: Optional[str]) -> Optional[int]:
+    """Parse If-Match for a route, answering 400 on malformed values"""
+    try:
+        return parse_if_match(if_match)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def version_query(expected_version: int) -> dict:
+    """Query fragment matching a document at the expected version"""
+    if expected_version == 0:
+        # Documents created before versioning have no version field
+        return {"version": {"$in": [0, None]}}
+    return {"version": expected_version}
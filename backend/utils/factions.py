@@ -0,0 +1,84 @@
+from database import get_db
+from config import config
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class FactionRegistry:
+    """In-process copy of the faction catalogue, indexed by code and by id.
+    
+    Loaded at startup and after initialize_factions. A lookup that misses
+    reloads the catalogue (at most once per FACTION_REGISTRY_RELOAD_INTERVAL_SECONDS)
+    so factions created by another worker are picked up.
+    """
+    
+    def __init__(self, reload_interval_seconds: float):
+        self.reload_interval_seconds = reload_interval_seconds
+        self._by_code: Dict[str, dict] = {}
+        self._by_id: Dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+    
+    async def load(self):
+        """(Re)load all factions from the database"""
+        db = get_db()
+        factions = await db.factions.find({}, {"_id": 0}).to_list(100)
+        
+        # Swap both indexes at once so readers never see a half-built registry
+        self._by_code = {faction['code']: faction for faction in factions}
+        self._by_id = {faction['id']: faction for faction in factions}
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+        logger.info(f"Faction registry loaded ({len(factions)} factions)")
+    
+    async def _reload_on_miss(self) -> bool:
+        """Reload unless that was done recently; returns True if a reload happened"""
+        async with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_interval_seconds:
+                return False
+            await self.load()
+            return True
+    
+    async def _get(self, index_name: str, key: str) -> Optional[dict]:
+        faction = getattr(self, index_name).get(key)
+        if faction is None and await self._reload_on_miss():
+            faction = getattr(self, index_name).get(key)
+        
+        if faction is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        # Callers get their own copy so they can't corrupt the registry
+        return dict(faction)
+    
+    async def get_by_code(self, code: str) -> Optional[dict]:
+        """Get faction by code (e.g. 'fsb')"""
+        return await self._get('_by_code', code)
+    
+    async def get_by_id(self, faction_id: str) -> Optional[dict]:
+        """Get faction by id"""
+        return await self._get('_by_id', faction_id)
+    
+    async def all(self) -> List[dict]:
+        """Get all factions"""
+        if self._loaded_at is None:
+            await self._reload_on_miss()
+        return [dict(faction) for faction in self._by_code.values()]
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "size": len(self._by_code),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads
+        }
+
+faction_registry = FactionRegistry(reload_interval_seconds=config.FACTION_REGISTRY_RELOAD_INTERVAL_SECONDS)
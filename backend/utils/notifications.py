@@ -1,10 +1,72 @@
+from config import config
 from database import get_db
 from models import Notification, NotificationTypeEnum
-from typing import List
+from pymongo import ReturnDocument, UpdateOne
+from typing import Iterable, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+async def seed_unread_counts(user_ids: List[str]):
+    """Create missing notification_counters documents from the notifications collection.
+    
+    Counters are created once per user (for users with notifications from
+    before counters existed) and then kept up to date by the service.
+    """
+    db = get_db()
+    existing = await db.notification_counters.find(
+        {"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1}
+    ).to_list(None)
+    missing = set(user_ids) - {counter['user_id'] for counter in existing}
+    if not missing:
+        return
+    
+    counts = await db.notifications.aggregate([
+        {"$match": {"user_id": {"$in": list(missing)}, "read": False}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    unread = {row['_id']: row['count'] for row in counts}
+    
+    # $setOnInsert: a counter created concurrently by another request wins
+    await db.notification_counters.bulk_write([
+        UpdateOne({"user_id": user_id}, {"$setOnInsert": {"unread": unread.get(user_id, 0)}}, upsert=True)
+        for user_id in missing
+    ], ordered=False)
+
+async def get_unread_count(user_id: str) -> int:
+    """Unread notifications of a user, read from the user's counter"""
+    db = get_db()
+    counter = await db.notification_counters.find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+    if counter is None:
+        await seed_unread_counts([user_id])
+        counter = await db.notification_counters.find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+    return counter['unread']
+
+async def release_unread_counts(docs: List[dict]):
+    """Take back the counter increments of notifications that were not written"""
+    db = get_db()
+    try:
+        written = await db.notifications.find(
+            {"id": {"$in": [doc['id'] for doc in docs]}}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        written_ids = {doc['id'] for doc in written}
+        lost = [doc['user_id'] for doc in docs if doc['id'] not in written_ids]
+        if lost:
+            await db.notification_counters.bulk_write([
+                UpdateOne({"user_id": user_id}, {"$inc": {"unread": -1}})
+                for user_id in lost
+            ], ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to correct unread counters after a failed notification insert: {e}")
+
+async def push_unread_count(user_id: str, unread_count: int):
+    """Push the current unread count to the user's connected clients"""
+    from websocket_server import send_unread_count
+    try:
+        await send_unread_count(user_id, unread_count)
+    except Exception as e:
+        logger.warning(f"Failed to push unread count to user {user_id}: {e}")
+
 class NotificationService:
     @staticmethod
     async def create_notification(
@@ -14,22 +76,73 @@ class NotificationService:
         message: str
     ):
         """Create a new notification for a user"""
+        notifications = await NotificationService.create_notifications_bulk(
+            [user_id], notification_type, title, message
+        )
+        return notifications[0]
+    
+    @staticmethod
+    async def create_notifications_bulk(
+        user_ids: Iterable[str],
+        notification_type: NotificationTypeEnum,
+        title: str,
+        message: str
+    ) -> List[Notification]:
+        """Create the same notification for many users.
+        
+        Documents are written with insert_many in NOTIFICATION_BATCH_SIZE
+        chunks and pushed to the users' sockets in one pass afterwards.
+        """
         db = get_db()
         
-        notification = Notification(
-            user_id=user_id,
-            type=notification_type,
-            title=title,
-            message=message
-        )
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return []
+        
+        notifications = [
+            Notification(user_id=user_id, type=notification_type, title=title, message=message)
+            for user_id in user_ids
+        ]
+        docs = [notification.model_dump() for notification in notifications]
+        
+        # Seed before writing so the new notifications are counted exactly once
+        await seed_unread_counts(user_ids)
+        
+        # Count before inserting: a notification can only be marked as read
+        # once it exists, so its decrement never runs ahead of its increment
+        await db.notification_counters.bulk_write([
+            UpdateOne({"user_id": user_id}, {"$inc": {"unread": 1}}, upsert=True)
+            for user_id in user_ids
+        ], ordered=False)
         
-        doc = notification.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
+        # insert_many adds _id to the documents it writes, so hand it copies
+        batch_size = config.NOTIFICATION_BATCH_SIZE
+        start = 0
+        try:
+            for start in range(0, len(docs), batch_size):
+                await db.notifications.insert_many([dict(doc) for doc in docs[start:start + batch_size]], ordered=False)
+        except Exception:
+            await release_unread_counts(docs[start:])
+            raise
+        logger.info(f"Notification created for {len(docs)} user(s): {title}")
         
-        await db.notifications.insert_one(doc)
-        logger.info(f"Notification created for user {user_id}: {title}")
+        counters = await db.notification_counters.find(
+            {"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1, "unread": 1}
+        ).to_list(None)
+        unread = {counter['user_id']: counter['unread'] for counter in counters}
+        payloads = [
+            {**doc, 'created_at': doc['created_at'].isoformat(), 'unread_count': unread.get(doc['user_id'], 1)}
+            for doc in docs
+        ]
         
-        return notification
+        # Push to the users' open tabs; the notifications are stored either way
+        from websocket_server import send_notifications
+        try:
+            await send_notifications(payloads)
+        except Exception as e:
+            logger.warning(f"Failed to push notifications: {e}")
+        
+        return notifications
     
     @staticmethod
     async def get_user_notifications(user_id: str, unread_only: bool = False) -> List[Notification]:
@@ -42,11 +155,6 @@ class NotificationService:
         
         notifications = await db.notifications.find(query, {"_id": 0}).sort("created_at", -1).limit(50).to_list(50)
         
-        # Convert ISO strings to datetime
-        for notif in notifications:
-            if isinstance(notif['created_at'], str):
-                notif['created_at'] = datetime.fromisoformat(notif['created_at'])
-        
         return notifications
     
     @staticmethod
@@ -59,6 +167,15 @@ class NotificationService:
             {"$set": {"read": True}}
         )
         
+        if result.modified_count:
+            counter = await db.notification_counters.find_one_and_update(
+                {"user_id": user_id},
+                {"$inc": {"unread": -1}},
+                projection={"_id": 0, "unread": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            await push_unread_count(user_id, counter['unread'] if counter else 0)
+        
         return result.modified_count > 0
     
     @staticmethod
@@ -71,6 +188,19 @@ class NotificationService:
             {"$set": {"read": True}}
         )
         
+        # Subtract what was marked rather than resetting to 0, so a notification
+        # created meanwhile keeps its increment
+        unread = 0
+        if result.modified_count:
+            counter = await db.notification_counters.find_one_and_update(
+                {"user_id": user_id},
+                {"$inc": {"unread": -result.modified_count}},
+                projection={"_id": 0, "unread": 1},
+                return_document=ReturnDocument.AFTER
+            )
+            unread = counter['unread'] if counter else 0
+        else:
+            unread = await get_unread_count(user_id)
+        await push_unread_count(user_id, unread)
+        
         return result.modified_count
-
-from datetime import datetime
@@ -0,0 +1,69 @@
+from database import get_db
+from config import config
+from utils.cache import TTLCache
+from utils.socket_manager import on_control_message
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Control message telling the other workers to drop a cached user
+PRINCIPAL_INVALIDATION = "invalidate_principal"
+
+# Authenticated user documents keyed by user id
+principal_cache = TTLCache(
+    max_size=config.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=config.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+async def get_principal(user_id: str) -> Optional[dict]:
+    """Get user document for an authenticated request, served from cache when possible"""
+    user = principal_cache.get(user_id)
+    
+    if user is None:
+        generation = principal_cache.generation()
+        
+        db = get_db()
+        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if not user:
+            return None
+        
+        principal_cache.set(user_id, user, generation=generation)
+    
+    # Callers get their own copy so they can't corrupt the cached entry
+    return dict(user)
+
+async def invalidate_principal(user_id: str):
+    """Drop cached user so the next request reloads it (call after any user write).
+    
+    Other workers drop it too when SOCKETIO_MESSAGE_QUEUE is set. Without a
+    queue, or if the message is lost, their copy stays valid for up to
+    PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    principal_cache.invalidate(user_id)
+    await publish_invalidation({"user_id": user_id})
+
+async def invalidate_all_principals():
+    """Drop all cached users, on every worker"""
+    principal_cache.clear()
+    await publish_invalidation({"user_id": None})
+
+async def publish_invalidation(data: dict):
+    from websocket_server import publish_control
+    
+    try:
+        await publish_control(PRINCIPAL_INVALIDATION, data)
+    except Exception as e:
+        logger.error(f"Failed to publish principal invalidation: {e}")
+
+@on_control_message(PRINCIPAL_INVALIDATION)
+def handle_invalidation(data: dict):
+    """Invalidation sent by another worker"""
+    if data.get("user_id"):
+        principal_cache.invalidate(data["user_id"])
+    else:
+        principal_cache.clear()
+
+def get_principal_cache_stats() -> dict:
+    """Hit/miss counters of the principal cache"""
+    return principal_cache.stats()
@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta, timezone
+from database import get_db
+from config import config
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, List, Optional
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY_SECONDS = 300
+
+# Lease document (in the leases collection) naming the one worker allowed to archive
+LEASE_ID = "audit_archiver"
+
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+ARCHIVE_FILE_PATTERN = re.compile(r"^audit-(\d{4}-\d{2})\.ndjson\.gz$")
+
+def archive_path(directory: str, month: str) -> str:
+    """File holding the archived entries of a month (YYYY-MM)"""
+    return os.path.join(directory, f"audit-{month}.ndjson.gz")
+
+def serialize_entry(doc: dict) -> str:
+    """One NDJSON line for an audit entry"""
+    return json.dumps(
+        doc,
+        ensure_ascii=False,
+        default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)
+    ) + "\n"
+
+def write_archive_lines(directory: str, lines_by_month: Dict[str, List[str]]):
+    """Append lines to the monthly archives (each append is a new gzip member)"""
+    os.makedirs(directory, exist_ok=True)
+    for month, lines in lines_by_month.items():
+        with open(archive_path(directory, month), "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                archive.write("".join(lines).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+def list_archives(directory: str) -> List[dict]:
+    """Archived months, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    
+    archives = []
+    for name in sorted(os.listdir(directory)):
+        match = ARCHIVE_FILE_PATTERN.match(name)
+        if match:
+            archives.append({
+                "month": match.group(1),
+                "file": name,
+                "size_bytes": os.path.getsize(os.path.join(directory, name))
+            })
+    return archives
+
+def read_archive(
+    directory: str,
+    month: str,
+    skip: int = 0,
+    limit: int = 100,
+    user_id: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    action: Optional[str] = None
+) -> List[dict]:
+    """Read archived entries of a month, oldest first.
+    
+    Raises ValueError for a malformed month and FileNotFoundError when the
+    month was never archived. An interrupted archive run may have written an
+    entry twice; duplicates are skipped by id.
+    """
+    if not MONTH_PATTERN.match(month):
+        raise ValueError(f"Invalid month: {month}")
+    
+    filters = {"user_id": user_id, "resource_type": resource_type, "action": action}
+    filters = {key: value for key, value in filters.items() if value}
+    
+    entries = []
+    seen = set()
+    with gzip.open(archive_path(directory, month), "rt", encoding="utf-8") as archive:
+        for line in archive:
+            entry = json.loads(line)
+            if entry.get('id') in seen or any(entry.get(key) != value for key, value in filters.items()):
+                continue
+            seen.add(entry.get('id'))
+            
+            if skip:
+                skip -= 1
+                continue
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+    return entries
+
+class AuditArchiver:
+    """Background task that moves audit entries older than the retention period to monthly archives.
+    
+    Expired entries are read oldest first in batches, appended to
+    AUDIT_ARCHIVE_DIR/audit-YYYY-MM.ndjson.gz and only then deleted, so a
+    crash can at worst archive an entry twice, never lose it.
+    
+    Every worker starts an archiver but only the holder of a lease document
+    archives; the lease is renewed for each batch, released on shutdown and
+    taken over by another worker once it expires.
+    """
+    
+    def __init__(self, directory: str, retention_days: int, interval_hours: int, batch_size: int):
+        self.directory = directory
+        self.retention = timedelta(days=retention_days)
+        self.interval = interval_hours * 3600
+        self.batch_size = batch_size
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Outlives the pause between two runs, so a live holder keeps the lease
+        self.lease_duration = timedelta(seconds=self.interval + RETRY_DELAY_SECONDS)
+        self._task: Optional[asyncio.Task] = None
+        self.lease_held = False
+        self.archived = 0
+        self.last_run: Optional[datetime] = None
+    
+    def start(self):
+        """Start the archiver (call from the app startup hook)"""
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Audit archiver started, archiving to {self.directory}")
+    
+    async def stop(self):
+        """Stop the archiver (call from the app shutdown hook)"""
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+        # Let another worker take over without waiting for the lease to expire
+        if self.lease_held:
+            try:
+                await get_db().leases.delete_one({"_id": LEASE_ID, "holder": self.holder})
+            except Exception as e:
+                logger.error(f"Failed to release audit archiver lease: {e}")
+            self.lease_held = False
+    
+    async def acquire_lease(self) -> bool:
+        """Take the archiver lease, or renew it if this worker holds it"""
+        db = get_db()
+        now = datetime.now(timezone.utc)
+        try:
+            await db.leases.update_one(
+                {"_id": LEASE_ID, "$or": [{"holder": self.holder}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": self.holder, "expires_at": now + self.lease_duration}},
+                upsert=True
+            )
+            self.lease_held = True
+        except DuplicateKeyError:
+            # Held by another worker: the upsert tried to insert a second lease document
+            self.lease_held = False
+        return self.lease_held
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.archive_expired(datetime.now(timezone.utc))
+                delay = self.interval
+            except Exception as e:
+                logger.error(f"Audit archiving failed: {e}")
+                delay = RETRY_DELAY_SECONDS
+            await asyncio.sleep(delay)
+    
+    async def archive_expired(self, now: datetime) -> int:
+        """Archive and delete every entry older than the retention period; returns how many.
+        
+        Does nothing unless this worker holds the lease.
+        """
+        db = get_db()
+        cutoff = now - self.retention
+        archived = 0
+        
+        while await self.acquire_lease():
+            batch = await db.audit_logs.find({"timestamp": {"$lt": cutoff}}).sort(
+                [("timestamp", 1), ("id", 1)]
+            ).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            
+            lines_by_month: Dict[str, List[str]] = {}
+            for doc in batch:
+                month = doc['timestamp'].strftime("%Y-%m")
+                entry = {key: value for key, value in doc.items() if key != '_id'}
+                lines_by_month.setdefault(month, []).append(serialize_entry(entry))
+            
+            await asyncio.to_thread(write_archive_lines, self.directory, lines_by_month)
+            await db.audit_logs.delete_many({"_id": {"$in": [doc['_id'] for doc in batch]}})
+            archived += len(batch)
+            
+            if len(batch) < self.batch_size:
+                break
+        
+        self.archived += archived
+        self.last_run = now
+        if archived:
+            logger.info(f"Archived {archived} audit entries older than {cutoff.date()}")
+        return archived
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "enabled": bool(self.directory),
+            "running": self._task is not None,
+            "lease_held": self.lease_held,
+            "retention_days": self.retention.days,
+            "archived": self.archived,
+            "last_run": self.last_run.isoformat() if self.last_run else None
+        }
+
+audit_archiver = AuditArchiver(
+    directory=config.AUDIT_ARCHIVE_DIR,
+    retention_days=config.AUDIT_RETENTION_DAYS,
+    interval_hours=config.AUDIT_ARCHIVE_INTERVAL_HOURS,
+    batch_size=config.AUDIT_ARCHIVE_BATCH_SIZE
+)
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+from database import get_db
+from config import config
+from utils.audit import log_action
+from utils.weeks import get_week_boundaries, build_week_document, ensure_table_data
+from pymongo import UpdateOne
+from typing import Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Never sleep longer than this, so clock changes and missed wake-ups are corrected
+MAX_SLEEP_SECONDS = 3600
+RETRY_DELAY_SECONDS = 60
+
+async def create_weeks_for_all_departments(monday: datetime, is_current: bool) -> int:
+    """Create the week starting at `monday` (and its table data) for every department that lacks it.
+    
+    Uses batched upserts on the unique (department_id, week_start) index, so it
+    is idempotent and safe to run from several workers. Returns the number of
+    weeks created.
+    """
+    db = get_db()
+    monday, sunday = get_week_boundaries(monday)
+    
+    departments = await db.departments.find({}, {"_id": 0, "id": 1}).to_list(None)
+    department_ids = [department['id'] for department in departments]
+    
+    created = 0
+    for start in range(0, len(department_ids), config.WEEK_ROLLOVER_BATCH_SIZE):
+        batch = department_ids[start:start + config.WEEK_ROLLOVER_BATCH_SIZE]
+        documents = [build_week_document(department_id, monday, sunday, is_current) for department_id in batch]
+        
+        result = await db.weeks.bulk_write([
+            UpdateOne(
+                {"department_id": week_doc['department_id'], "week_start": week_doc['week_start']},
+                {"$setOnInsert": week_doc},
+                upsert=True
+            )
+            for week_doc in documents
+        ], ordered=False)
+        created += len(result.upserted_ids)
+        
+        # Table data for every week of the batch that lacks it, including weeks whose
+        # table was never written because an earlier run stopped in between
+        weeks = await db.weeks.find(
+            {"department_id": {"$in": batch}, "week_start": monday},
+            {"_id": 0, "id": 1, "department_id": 1}
+        ).to_list(None)
+        await ensure_table_data(weeks, monday)
+    
+    return created
+
+async def activate_week(monday: datetime) -> int:
+    """Make the week starting at `monday` the current one for every department"""
+    db = get_db()
+    
+    # Departments added after the week was prepared get it now
+    created = await create_weeks_for_all_departments(monday, is_current=True)
+    
+    await db.weeks.update_many(
+        {"week_start": monday, "is_current": {"$ne": True}},
+        {"$set": {"is_current": True}}
+    )
+    await db.weeks.update_many(
+        {"week_start": {"$ne": monday}, "is_current": True},
+        {"$set": {"is_current": False}}
+    )
+    
+    return created
+
+class WeekRolloverScheduler:
+    """Background task that prepares next week ahead of the boundary and switches to it on Monday.
+    
+    Next week's weeks/table_data are created WEEK_ROLLOVER_LEAD_HOURS before
+    Monday 00:00 UTC; at the boundary they are flagged as current. On startup
+    the current week is activated, catching up on any missed rollover.
+    """
+    
+    def __init__(self, lead_hours: int):
+        self.lead = timedelta(hours=lead_hours)
+        self._task: Optional[asyncio.Task] = None
+        self._prepared: Optional[datetime] = None
+        self._activated: Optional[datetime] = None
+    
+    def start(self):
+        """Start the scheduler (call from the app startup hook)"""
+        self._task = asyncio.create_task(self._run())
+        logger.info("Week rollover scheduler started")
+    
+    async def stop(self):
+        """Stop the scheduler (call from the app shutdown hook)"""
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                delay = await self.run_pending(datetime.now(timezone.utc))
+            except Exception as e:
+                logger.error(f"Week rollover failed: {e}")
+                delay = RETRY_DELAY_SECONDS
+            await asyncio.sleep(delay)
+    
+    async def run_pending(self, now: datetime) -> float:
+        """Do whatever is due at `now`; returns seconds until the next check"""
+        monday, _ = get_week_boundaries(now)
+        next_monday = monday + timedelta(days=7)
+        
+        if self._activated != monday:
+            created = await activate_week(monday)
+            self._activated = monday
+            await self._log("weeks_activated", monday, created)
+        
+        if now >= next_monday - self.lead and self._prepared != next_monday:
+            created = await create_weeks_for_all_departments(next_monday, is_current=False)
+            self._prepared = next_monday
+            await self._log("weeks_precreated", next_monday, created)
+        
+        wake_at = next_monday if self._prepared == next_monday else next_monday - self.lead
+        return min(max((wake_at - now).total_seconds(), 1), MAX_SLEEP_SECONDS)
+    
+    async def _log(self, action: str, monday: datetime, created: int):
+        logger.info(f"{action} for week of {monday.date()}: {created} weeks created")
+        if created:
+            await log_action(
+                user_id="system",
+                user_email="system",
+                action=action,
+                resource_type="week",
+                resource_id=monday.isoformat(),
+                new_value={"weeks_created": created}
+            )
+
+week_rollover = WeekRolloverScheduler(lead_hours=config.WEEK_ROLLOVER_LEAD_HOURS)
@@ -2,10 +2,28 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from config import config
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import secrets
+import time
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow (tens of ms per call); it runs on these threads
+# so a burst of logins doesn't block the event loop
+password_executor = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+password_hash_stats = {
+    "pending": 0,
+    "peak_pending": 0,
+    "completed": 0,
+    "queue_wait_ms_total": 0.0,
+    "run_ms_total": 0.0
+}
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
     return pwd_context.hash(password)
@@ -14,6 +32,57 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_password_job(func, *args):
+    """Run a bcrypt call on the password executor, tracking queue depth and timings.
+    
+    The worker thread only records its own start/end times; the counters are
+    updated here on the event loop, so no lock is needed.
+    """
+    stats = password_hash_stats
+    stats["pending"] += 1
+    stats["peak_pending"] = max(stats["peak_pending"], stats["pending"])
+    submitted = time.perf_counter()
+    timings = {}
+    
+    def job():
+        timings["started"] = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings["finished"] = time.perf_counter()
+    
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, job)
+    finally:
+        stats["pending"] -= 1
+        stats["completed"] += 1
+        if "finished" in timings:
+            stats["queue_wait_ms_total"] += (timings["started"] - submitted) * 1000
+            stats["run_ms_total"] += (timings["finished"] - timings["started"]) * 1000
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+def get_password_hash_stats() -> dict:
+    """Queue depth and timings of the password executor"""
+    stats = password_hash_stats
+    completed = stats["completed"]
+    return {
+        "workers": config.PASSWORD_HASH_WORKERS,
+        "pending": stats["pending"],
+        # Jobs waiting for a free worker thread
+        "queued": max(0, stats["pending"] - config.PASSWORD_HASH_WORKERS),
+        "peak_pending": stats["peak_pending"],
+        "completed": completed,
+        "avg_queue_wait_ms": round(stats["queue_wait_ms_total"] / completed, 2) if completed else 0.0,
+        "avg_run_ms": round(stats["run_ms_total"] / completed, 2) if completed else 0.0
+    }
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
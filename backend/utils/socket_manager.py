@@ -0,0 +1,143 @@
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+import asyncio
+import importlib.util
+import json
+import logging
+import pickle
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Handlers of control messages exchanged between workers: {method: handler(data)}
+control_handlers: Dict[str, Callable[[dict], None]] = {}
+
+def on_control_message(method: str):
+    """Register the handler of a control message (e.g. cache invalidation) sent by other workers"""
+    def register(handler: Callable[[dict], None]):
+        control_handlers[method] = handler
+        return handler
+    return register
+
+def decode_message(message) -> Optional[dict]:
+    """Decode a pub/sub message the way the Socket.IO managers do (pickle, then JSON)"""
+    if isinstance(message, dict):
+        return message
+    for loads in (pickle.loads, json.loads):
+        try:
+            data = loads(message)
+        except Exception:
+            continue
+        return data if isinstance(data, dict) else None
+    return None
+
+class ControlMessageMixin:
+    """Lets workers exchange their own messages over the Socket.IO message queue.
+    
+    Messages whose method has a registered handler are handled here (and
+    skipped on the worker that sent them); everything else goes on to the
+    Socket.IO manager untouched.
+    """
+    
+    async def _listen(self):
+        async for message in super()._listen():
+            data = decode_message(message)
+            handler = control_handlers.get(data.get('method')) if data else None
+            if handler is None:
+                yield message
+                continue
+            
+            if data.get('host_id') != self.host_id:
+                try:
+                    handler(data)
+                except Exception as e:
+                    logger.error(f"Control message {data['method']} failed: {e}")
+    
+    async def publish_control(self, method: str, data: dict):
+        """Send a control message to the other workers"""
+        await self._publish({**data, 'method': method, 'host_id': self.host_id})
+
+class InProcessBroker:
+    """Minimal pub/sub broker living in the current process.
+    
+    Lets several Socket.IO servers in one process (tests, local runs) share
+    events the way workers share them through Redis or RabbitMQ.
+    """
+    
+    def __init__(self):
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {}
+    
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(channel, []).append(queue)
+        return queue
+    
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(channel, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self.subscribers.pop(channel, None)
+    
+    def publish(self, channel: str, message: dict):
+        # Serialise like a real transport would, so each subscriber gets its own copy
+        data = pickle.dumps(message)
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait(data)
+
+local_broker = InProcessBroker()
+
+class AsyncInProcessPubSubManager(AsyncPubSubManager):
+    """Client manager that fans events out through an InProcessBroker"""
+    
+    name = 'asyncinprocess'
+    
+    def __init__(self, channel: str = 'socketio', write_only: bool = False, logger=None, broker: Optional[InProcessBroker] = None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.broker = broker or local_broker
+    
+    async def _publish(self, data):
+        self.broker.publish(self.channel, data)
+    
+    async def _listen(self):
+        queue = self.broker.subscribe(self.channel)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.broker.unsubscribe(self.channel, queue)
+
+class AsyncInProcessManager(ControlMessageMixin, AsyncInProcessPubSubManager):
+    pass
+
+class AsyncRedisManager(ControlMessageMixin, socketio.AsyncRedisManager):
+    pass
+
+class AsyncAioPikaManager(ControlMessageMixin, socketio.AsyncAioPikaManager):
+    pass
+
+def require_package(module: str, package: str, scheme: str):
+    """Fail at startup with an actionable message when a message queue client isn't installed"""
+    if importlib.util.find_spec(module) is None:
+        raise RuntimeError(
+            f"SOCKETIO_MESSAGE_QUEUE uses {scheme}:// but the '{package}' package is not installed "
+            f"(pip install {package})"
+        )
+
+def create_client_manager(url: str, channel: str = 'socketio') -> Optional[socketio.AsyncManager]:
+    """Build the Socket.IO client manager for a message queue URL.
+    
+    Empty URL: single-process manager (None lets the server use its default).
+    redis:// / rediss://: Redis pub/sub. amqp://: RabbitMQ. local://: in-process broker.
+    """
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://')):
+        require_package('redis', 'redis', 'redis')
+        return AsyncRedisManager(url, channel=channel)
+    if url.startswith('amqp://'):
+        require_package('aio_pika', 'aio-pika', 'amqp')
+        return AsyncAioPikaManager(url, channel=channel)
+    if url.startswith('local://'):
+        return AsyncInProcessManager(channel=channel)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {url}")
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from database import get_db
+from config import config
+from utils.cache import TTLCache
+import asyncio
+
+STATS_KEY = "admin_stats"
+
+# Single cached snapshot of the admin dashboard counters
+stats_cache = TTLCache(max_size=1, ttl_seconds=config.ADMIN_STATS_CACHE_TTL_SECONDS)
+
+USER_STATS_PIPELINE = [
+    {"$match": {"is_active": True}},
+    {"$facet": {
+        "total": [{"$count": "count"}],
+        "by_role": [{"$group": {"_id": "$role", "count": {"$sum": 1}}}],
+        "by_faction": [{"$group": {"_id": "$faction", "count": {"$sum": 1}}}]
+    }}
+]
+
+async def compute_admin_stats() -> dict:
+    """Count active users (total, per role, per faction), departments, factions and recent logins"""
+    db = get_db()
+    day_ago = datetime.now(timezone.utc) - timedelta(days=1)
+    
+    user_stats, total_departments, total_factions, recent_logins = await asyncio.gather(
+        db.users.aggregate(USER_STATS_PIPELINE).to_list(1),
+        db.departments.count_documents({}),
+        db.factions.count_documents({}),
+        db.audit_logs.count_documents({
+            'action': 'user_login',
+            'timestamp': {'$gte': day_ago}
+        })
+    )
+    
+    facets = user_stats[0] if user_stats else {}
+    total = facets.get("total") or [{"count": 0}]
+    
+    return {
+        "total_users": total[0]["count"],
+        "total_departments": total_departments,
+        "total_factions": total_factions,
+        "users_by_role": {item["_id"]: item["count"] for item in facets.get("by_role", []) if item["_id"]},
+        "users_by_faction": {item["_id"]: item["count"] for item in facets.get("by_faction", []) if item["_id"]},
+        "recent_logins_24h": recent_logins
+    }
+
+async def get_admin_stats_snapshot() -> dict:
+    """Get admin statistics, recomputed at most once per ADMIN_STATS_CACHE_TTL_SECONDS"""
+    stats = stats_cache.get(STATS_KEY)
+    
+    if stats is None:
+        generation = stats_cache.generation()
+        stats = await compute_admin_stats()
+        stats_cache.set(STATS_KEY, stats, generation=generation)
+    
+    return stats
+
+def invalidate_admin_stats():
+    """Drop the snapshot (call after creating, updating or deleting users or departments)"""
+    stats_cache.invalidate(STATS_KEY)
@@ -0,0 +1,217 @@
+from models import TableDataOperation
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Union
+
+TABLE_OPERATIONS = ('set_cell', 'add_row', 'remove_row', 'rename_employee')
+
+# Status values and the "empty" value a new week starts with
+ATTENDANCE_VALUES = ('present', 'absent')
+ATTESTATION_VALUES = ('passed', 'excellent', 'not_passed')
+
+def validate_column_key(column: Optional[str]):
+    """Reject cell keys that can't be used as a MongoDB field path segment"""
+    if not column or '.' in column or column.startswith('$') or '\x00' in column:
+        raise ValueError(f"Invalid column key: {column!r}")
+
+def validate_operation(operation: TableDataOperation):
+    """Check that an operation carries the fields its type needs"""
+    if operation.op not in TABLE_OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation.op!r}")
+    
+    if operation.op == 'add_row':
+        if operation.row is None:
+            raise ValueError("add_row requires 'row'")
+        return
+    
+    if not operation.employee_name:
+        raise ValueError(f"{operation.op} requires 'employee_name'")
+    
+    if operation.op == 'set_cell':
+        validate_column_key(operation.column)
+    elif operation.op == 'rename_employee' and not operation.new_name:
+        raise ValueError("rename_employee requires 'new_name'")
+
+# Row array as seen by a pipeline update stage
+ROWS_EXPR = {"$ifNull": ["$rows", []]}
+
+def required_employees(operations: List[TableDataOperation]) -> List[str]:
+    """Employees that must already have a row for the batch to apply.
+    
+    Raises ValueError for malformed operations and LookupError when an
+    operation targets a row that an earlier operation in the same batch
+    removed or renamed away.
+    """
+    required = []
+    # Rows added, removed or renamed by the batch itself: name -> still present
+    touched = {}
+    
+    for operation in operations:
+        validate_operation(operation)
+        
+        if operation.op == 'add_row':
+            touched[operation.row.employee_name] = True
+            continue
+        
+        name = operation.employee_name
+        if name not in touched:
+            if name not in required:
+                required.append(name)
+        elif not touched[name]:
+            raise LookupError(f"No row for employee {name!r}")
+        
+        if operation.op == 'remove_row':
+            touched[name] = False
+        elif operation.op == 'rename_employee' and operation.new_name != name:
+            touched[name] = False
+            touched[operation.new_name] = True
+    
+    return required
+
+def build_patch_update(operations: List[TableDataOperation], now: datetime) -> Tuple[Union[dict, list], Optional[list]]:
+    """Compile patch operations into a single update of the table_data document.
+    
+    A batch of one kind becomes a classic update: $set through array filters
+    by employee name, $push or $pull. Mixed batches become one aggregation
+    pipeline update whose stages apply the operations in order. Either way
+    the batch lands atomically and bumps the version once.
+    Returns (update, array_filters).
+    """
+    kinds = {operation.op for operation in operations}
+    
+    if kinds == {'set_cell'}:
+        fields = {}
+        filters = {}
+        for operation in operations:
+            # One array filter identifier per distinct row
+            ident = filters.setdefault(operation.employee_name, f"r{len(filters)}")
+            fields[f"rows.$[{ident}].cells.{operation.column}"] = operation.value
+        array_filters = [{f"{ident}.employee_name": name} for name, ident in filters.items()]
+        return {"$set": {**fields, "updated_at": now}, "$inc": {"version": 1}}, array_filters
+    
+    if kinds == {'add_row'}:
+        rows = [operation.row.model_dump() for operation in operations]
+        return {"$push": {"rows": {"$each": rows}}, "$set": {"updated_at": now}, "$inc": {"version": 1}}, None
+    
+    if kinds == {'remove_row'}:
+        names = [operation.employee_name for operation in operations]
+        return {"$pull": {"rows": {"employee_name": {"$in": names}}}, "$set": {"updated_at": now}, "$inc": {"version": 1}}, None
+    
+    if kinds == {'rename_employee'} and len(operations) == 1:
+        operation = operations[0]
+        return (
+            {"$set": {"rows.$[row].employee_name": operation.new_name, "updated_at": now}, "$inc": {"version": 1}},
+            [{"row.employee_name": operation.employee_name}]
+        )
+    
+    return build_patch_pipeline(operations, now), None
+
+def build_patch_pipeline(operations: List[TableDataOperation], now: datetime) -> List[dict]:
+    """Aggregation pipeline update applying mixed operations in order"""
+    stages = []
+    kind = None
+    items = []
+    
+    def flush():
+        if kind == 'set_cell':
+            # Last value wins per employee and column, like consecutive $set fields
+            values = {}
+            for name, column, value in items:
+                values.setdefault(name, {})[column] = value
+            stages.append(map_rows([
+                {"case": {"$eq": ["$$row.employee_name", {"$literal": name}]}, "then": {
+                    "employee_name": "$$row.employee_name",
+                    "cells": set_cells_expression(cells)
+                }}
+                for name, cells in values.items()
+            ]))
+        elif kind == 'add_row':
+            stages.append({"$set": {"rows": {"$concatArrays": [ROWS_EXPR, {"$literal": list(items)}]}}})
+        elif kind == 'remove_row':
+            stages.append({"$set": {"rows": {"$filter": {
+                "input": ROWS_EXPR,
+                "as": "row",
+                "cond": {"$not": {"$in": ["$$row.employee_name", {"$literal": list(items)}]}}
+            }}}})
+    
+    for operation in operations:
+        if operation.op != kind or operation.op == 'rename_employee':
+            flush()
+            kind = operation.op
+            items = []
+        
+        if operation.op == 'set_cell':
+            items.append((operation.employee_name, operation.column, operation.value))
+        elif operation.op == 'add_row':
+            items.append(operation.row.model_dump())
+        elif operation.op == 'remove_row':
+            items.append(operation.employee_name)
+        elif operation.op == 'rename_employee':
+            stages.append(map_rows([
+                {"case": {"$eq": ["$$row.employee_name", {"$literal": operation.employee_name}]}, "then": {
+                    "employee_name": {"$literal": operation.new_name},
+                    "cells": "$$row.cells"
+                }}
+            ]))
+            kind = None
+    
+    flush()
+    stages.append({"$set": {"updated_at": now, "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}})
+    return stages
+
+def map_rows(branches: List[dict]) -> dict:
+    """Pipeline stage replacing the rows matched by a $switch branch"""
+    return {"$set": {"rows": {"$map": {
+        "input": ROWS_EXPR,
+        "as": "row",
+        "in": {"$switch": {"branches": branches, "default": "$$row"}}
+    }}}}
+
+def set_cells_expression(values: dict) -> dict:
+    """Expression for $$row.cells with the given cells set, keeping the order of existing keys"""
+    pairs = [{"k": column, "v": value} for column, value in values.items()]
+    return {"$let": {
+        "vars": {"cells": {"$objectToArray": {"$ifNull": ["$$row.cells", {}]}}},
+        "in": {"$arrayToObject": {"$concatArrays": [
+            {"$map": {
+                "input": "$$cells",
+                "as": "cell",
+                "in": {"k": "$$cell.k", "v": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$$cell.k", {"$literal": column}]}, "then": {"$literal": value}}
+                        for column, value in values.items()
+                    ],
+                    "default": "$$cell.v"
+                }}}
+            }},
+            {"$filter": {
+                "input": {"$literal": pairs},
+                "as": "cell",
+                "cond": {"$not": {"$in": ["$$cell.k", "$$cells.k"]}}
+            }}
+        ]}}
+    }}
+
+def reset_cell_value(value: Any) -> Any:
+    """Default value of a cell for a fresh week (same defaults as a newly added row)"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return 0
+    if value in ATTENDANCE_VALUES:
+        return 'absent'
+    if value in ATTESTATION_VALUES:
+        return 'not_passed'
+    if isinstance(value, str):
+        return ''
+    return None
+
+def carry_forward_rows(rows: List[dict]) -> List[dict]:
+    """Keep employees and columns of last week's rows, with every cell reset"""
+    return [
+        {
+            "employee_name": row['employee_name'],
+            "cells": {key: reset_cell_value(value) for key, value in (row.get('cells') or {}).items()}
+        }
+        for row in rows
+        if row.get('employee_name')
+    ]
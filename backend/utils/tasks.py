@@ -0,0 +1,20 @@
+from typing import Coroutine, Set
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fire-and-forget tasks still running; the event loop only keeps weak references to tasks
+background_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro: Coroutine, name: str) -> asyncio.Task:
+    """Run a coroutine in the background, keeping it alive until done and logging its failure"""
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+def _task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed: {task.exception()!r}")
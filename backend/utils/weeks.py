@@ -1,6 +1,14 @@
 from datetime import datetime, timedelta, timezone
+from database import get_db
+from models import WeekBase, TableData
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.table_data import carry_forward_rows
+from typing import Dict, List, Optional, Tuple
 import calendar
 
+DUPLICATE_KEY_ERROR = 11000
+
 def get_week_boundaries(date: datetime = None) -> tuple:
     """Get Monday and Sunday for the week containing the given date"""
     if date is None:
@@ -36,3 +44,122 @@ def get_month_name_ru(month: int) -> str:
         "Июля", "Августа", "Сентября", "Октября", "Ноября", "Декабря"
     ]
     return months[month - 1]
+
+def build_week_document(department_id: str, monday: datetime, sunday: datetime, is_current: bool) -> dict:
+    """Build the week document for a new week"""
+    return WeekBase(
+        department_id=department_id,
+        week_start=monday,
+        week_end=sunday,
+        is_current=is_current
+    ).model_dump()
+
+async def find_week(department_id: str, monday: datetime) -> Optional[dict]:
+    """Point read of a department's week by its start (unique index on department_id + week_start)"""
+    db = get_db()
+    return await db.weeks.find_one(
+        {"department_id": department_id, "week_start": monday},
+        {"_id": 0}
+    )
+
+async def get_carry_forward_rows(department_ids: List[str], monday: datetime) -> Dict[str, List[dict]]:
+    """Rows of each department's latest week before `monday`, with cells reset to defaults"""
+    db = get_db()
+    if not department_ids:
+        return {}
+    
+    previous = await db.weeks.aggregate([
+        {"$match": {"department_id": {"$in": department_ids}, "week_start": {"$lt": monday}}},
+        {"$sort": {"department_id": 1, "week_start": -1}},
+        {"$group": {"_id": "$department_id", "week_id": {"$first": "$id"}}},
+        {"$lookup": {
+            "from": "table_data",
+            "localField": "week_id",
+            "foreignField": "week_id",
+            "as": "table"
+        }},
+        {"$project": {"rows": "$table.rows"}}
+    ]).to_list(None)
+    
+    # $lookup yields a list of row lists (at most one table per week)
+    return {
+        item['_id']: carry_forward_rows(item['rows'][0])
+        for item in previous
+        if item.get('rows')
+    }
+
+async def ensure_table_data(weeks: List[dict], monday: datetime) -> int:
+    """Create the missing table data of weeks starting at `monday`, from last week's roster.
+    
+    Idempotent and safe to call concurrently ($setOnInsert upserts on the unique
+    week_id index). Returns the number of tables created.
+    """
+    db = get_db()
+    if not weeks:
+        return 0
+    
+    existing = await db.table_data.find(
+        {"week_id": {"$in": [week['id'] for week in weeks]}},
+        {"_id": 0, "week_id": 1}
+    ).to_list(None)
+    existing_ids = {table['week_id'] for table in existing}
+    missing = [week for week in weeks if week['id'] not in existing_ids]
+    if not missing:
+        return 0
+    
+    carried = await get_carry_forward_rows([week['department_id'] for week in missing], monday)
+    try:
+        await db.table_data.bulk_write([
+            UpdateOne(
+                {"week_id": week['id']},
+                {"$setOnInsert": TableData(
+                    week_id=week['id'],
+                    department_id=week['department_id'],
+                    rows=carried.get(week['department_id'], [])
+                ).model_dump()},
+                upsert=True
+            )
+            for week in missing
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Concurrent upserts of the same table: someone else inserted it first
+        if any(error.get('code') != DUPLICATE_KEY_ERROR for error in e.details.get('writeErrors', [])):
+            raise
+    
+    return len(missing)
+
+async def ensure_week(department_id: str, monday: datetime, sunday: datetime, is_current: bool = True) -> Tuple[dict, bool]:
+    """Get or create a department's week and its table data; safe to call concurrently.
+    
+    Returns (week, created). Only the caller whose upsert inserted the week
+    gets created=True, so side effects (audit, notifications) happen once.
+    Every caller makes sure the table data exists before returning, which also
+    repairs a week whose table was never written (crash after the week upsert).
+    """
+    db = get_db()
+    week_doc = build_week_document(department_id, monday, sunday, is_current)
+    query = {"department_id": department_id, "week_start": week_doc['week_start']}
+    
+    try:
+        week = await db.weeks.find_one_and_update(
+            query,
+            {"$setOnInsert": week_doc},
+            upsert=True,
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert inserted it first
+        week = await db.weeks.find_one(query, {"_id": 0})
+    
+    await ensure_table_data([week], monday)
+    
+    created = week['id'] == week_doc['id']
+    if created and is_current:
+        # Only one current week per department
+        await db.weeks.update_many(
+            {"department_id": department_id, "is_current": True, "id": {"$ne": week['id']}},
+            {"$set": {"is_current": False}}
+        )
+    
+    return week, created
@@ -0,0 +1,55 @@
+"""
+Index manifest verification
+
+Compares the indexes of the configured database with database.INDEX_MANIFEST
+and reports missing indexes, indexes that are not in the manifest (drift) and
+indexes that have not been used since the server started ($indexStats).
+
+Usage: python verify_indexes.py [--apply] [--drop-extra]
+"""
+import argparse
+import asyncio
+import sys
+
+import database
+from config import config
+
+async def main(args) -> int:
+    if args.apply:
+        await database.connect_db()
+    else:
+        # Connect without touching the indexes
+        database.Database.client = database.create_client()
+        database.Database.db = database.Database.client[config.DB_NAME]
+    
+    try:
+        report = await database.verify_indexes()
+        
+        if args.drop_extra:
+            for collection, problems in report.items():
+                for name in problems['extra']:
+                    print(f"Dropping {collection}.{name}")
+                    await database.Database.db[collection].drop_index(name)
+                problems['extra'] = []
+        
+        if not report:
+            print("Indexes match the manifest")
+            return 0
+        
+        for collection, problems in sorted(report.items()):
+            print(collection)
+            for keys in problems['missing']:
+                print(f"  missing: {keys}")
+            for name in problems['extra']:
+                print(f"  not in manifest: {name}")
+            for name in problems['unused']:
+                print(f"  unused since server start: {name}")
+        return 1 if any(problems['missing'] or problems['extra'] for problems in report.values()) else 0
+    finally:
+        await database.close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--apply", action="store_true", help="create the manifest indexes first")
+    parser.add_argument("--drop-extra", action="store_true", help="drop indexes that are not in the manifest")
+    sys.exit(asyncio.run(main(parser.parse_args())))
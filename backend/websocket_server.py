@@ -1,13 +1,23 @@
 import socketio
+import asyncio
 import logging
-from typing import Dict, Set
+from config import config
+from fastapi import HTTPException
+from utils.security import decode_token
+from utils.principals import get_principal
+from utils.permissions import Permissions
+from utils.access import resolve_department_access
+from utils.socket_manager import create_client_manager
+from utils.tasks import spawn
+from typing import Dict, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
-# Create Socket.IO server with CORS
+# Create Socket.IO server with CORS; with SOCKETIO_MESSAGE_QUEUE set, emits reach clients on all workers
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins='*',
+    client_manager=create_client_manager(config.SOCKETIO_MESSAGE_QUEUE, channel=config.SOCKETIO_CHANNEL),
     logger=False,
     engineio_logger=False
 )
@@ -18,81 +28,235 @@ connections: Dict[str, Set[str]] = {}
 # Store faction subscriptions: {faction_code: set of sids}
 faction_rooms: Dict[str, Set[str]] = {}
 
+# Reverse index: {sid: {"user_id", "role", "faction", "department_id", "rooms"}} so a sid is cleaned up without scanning
+sessions: Dict[str, dict] = {}
+
+def add_to_index(index: Dict[str, Set[str]], key: str, sid: str):
+    """Add sid under key"""
+    index.setdefault(key, set()).add(sid)
+
+def remove_from_index(index: Dict[str, Set[str]], key: Optional[str], sid: str):
+    """Remove sid under key, dropping the key once its set is empty"""
+    sids = index.get(key)
+    if sids is None:
+        return
+    sids.discard(sid)
+    if not sids:
+        del index[key]
+
+def forget_session(sid: str) -> Optional[dict]:
+    """Remove a sid from all indexes"""
+    session = sessions.pop(sid, None)
+    if session:
+        remove_from_index(connections, session['user_id'], sid)
+        remove_from_index(faction_rooms, session['faction'], sid)
+    return session
+
+def get_connection_stats() -> dict:
+    """Sizes of the connection indexes"""
+    return {
+        "sessions": len(sessions),
+        "users": len(connections),
+        "factions": len(faction_rooms),
+        "department_subscriptions": sum(len(session['rooms']) for session in sessions.values())
+    }
+
+def merge_table_updates(pending: dict, update: dict) -> dict:
+    """Combine two consecutive table_updated payloads for the same week.
+    
+    The result goes from the first update's base_version to the latest version.
+    Rows replace everything before them and operations are appended. If the
+    updates don't chain (version gap) or one has no delta, the delta is dropped
+    and viewers reload instead.
+    """
+    merged = dict(update, base_version=pending.get('base_version'))
+    merged.pop('rows', None)
+    merged.pop('operations', None)
+    
+    chained = pending.get('version') is not None and pending.get('version') == update.get('base_version')
+    has_delta = 'rows' in pending or 'operations' in pending
+    
+    if 'rows' in update:
+        merged['rows'] = update['rows']
+    elif 'operations' in update and chained and has_delta:
+        if 'rows' in pending:
+            merged['rows'] = pending['rows']
+        merged['operations'] = pending.get('operations', []) + update['operations']
+    
+    return merged
+
+class CoalescingEmitter:
+    """Sends at most one table_updated per week and room per window, carrying the merged change"""
+    
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self.received = 0
+        self.emitted = 0
+    
+    async def submit(self, room: str, payload: dict):
+        """Queue an update; the first one for a room/week starts the window"""
+        self.received += 1
+        if self.window_seconds <= 0:
+            await self._emit(room, payload)
+            return
+        
+        key = (room, payload['week_id'])
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = payload
+            spawn(self._flush_later(key), name=f"flush_table_updates:{key[1]}")
+        else:
+            self._pending[key] = merge_table_updates(pending, payload)
+    
+    async def _flush_later(self, key: Tuple[str, str]):
+        await asyncio.sleep(self.window_seconds)
+        payload = self._pending.pop(key, None)
+        if payload is not None:
+            await self._emit(key[0], payload)
+    
+    async def _emit(self, room: str, payload: dict):
+        self.emitted += 1
+        await sio.emit('table_updated', payload, room=room)
+    
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        pending = len(self._pending)
+        return {
+            "window_ms": int(self.window_seconds * 1000),
+            "received": self.received,
+            "emitted": self.emitted,
+            "pending": pending,
+            "emits_saved": self.received - self.emitted - pending
+        }
+
+table_update_emitter = CoalescingEmitter(window_seconds=config.SOCKET_COALESCE_WINDOW_MS / 1000)
+
+async def authenticate_handshake(environ: dict, auth: Optional[dict]) -> Optional[dict]:
+    """Resolve the user from the access token sent at connect (auth.token or Authorization header)"""
+    token = auth.get('token') if isinstance(auth, dict) else None
+    if not token:
+        header = environ.get('HTTP_AUTHORIZATION', '')
+        if header.startswith('Bearer '):
+            token = header[len('Bearer '):]
+    if not token:
+        return None
+    
+    payload = decode_token(token)
+    if not payload or payload.get('type') != 'access' or not payload.get('user_id'):
+        return None
+    
+    user = await get_principal(payload['user_id'])
+    if not user or not user.get('is_active'):
+        return None
+    return user
+
 @sio.event
 async def connect(sid, environ, auth):
-    """Handle client connection"""
-    logger.info(f"Client connected: {sid}")
+    """Handle client connection (refused without a valid access token)"""
+    user = await authenticate_handshake(environ, auth)
+    if not user:
+        logger.info(f"Refused unauthenticated client: {sid}")
+        raise socketio.exceptions.ConnectionRefusedError('Authentication required')
+    
+    # Store connection
+    sessions[sid] = {
+        "user_id": user['id'],
+        "role": user['role'],
+        "faction": user.get('faction'),
+        "department_id": user.get('department_id'),
+        "rooms": set()
+    }
+    add_to_index(connections, user['id'], sid)
+    
+    # Personal room, so notifications reach the user from any worker
+    await sio.enter_room(sid, f"user_{user['id']}")
+    
+    # Join own faction room
+    if user.get('faction'):
+        add_to_index(faction_rooms, user['faction'], sid)
+        await sio.enter_room(sid, f"faction_{user['faction']}")
+    
+    logger.info(f"User {user['id']} connected on sid {sid}")
     return True
 
 @sio.event
 async def disconnect(sid):
     """Handle client disconnection"""
     logger.info(f"Client disconnected: {sid}")
-    
-    # Remove from all connections
-    for user_id, sids in connections.items():
-        if sid in sids:
-            sids.remove(sid)
-    
-    # Remove from faction rooms
-    for faction_code, sids in faction_rooms.items():
-        if sid in sids:
-            sids.remove(sid)
+    forget_session(sid)
 
 @sio.event
 async def authenticate(sid, data):
-    """Authenticate user and store connection"""
-    user_id = data.get('user_id')
-    faction = data.get('faction')
-    
-    if not user_id:
-        await sio.emit('error', {'message': 'User ID required'}, room=sid)
-        return
-    
-    # Store connection
-    if user_id not in connections:
-        connections[user_id] = set()
-    connections[user_id].add(sid)
-    
-    # Join faction room if provided
-    if faction:
-        if faction not in faction_rooms:
-            faction_rooms[faction] = set()
-        faction_rooms[faction].add(sid)
-        await sio.enter_room(sid, f"faction_{faction}")
-    
-    logger.info(f"User {user_id} authenticated on sid {sid}")
-    await sio.emit('authenticated', {'user_id': user_id}, room=sid)
+    """Kept for older clients: identity comes from the handshake, client-supplied ids are ignored"""
+    session = sessions.get(sid)
+    if session:
+        await sio.emit('authenticated', {'user_id': session['user_id']}, room=sid)
 
 @sio.event
 async def join_department(sid, data):
     """Join department room for real-time updates"""
     department_id = data.get('department_id')
-    if department_id:
-        await sio.enter_room(sid, f"department_{department_id}")
-        logger.info(f"Client {sid} joined department {department_id}")
+    session = sessions.get(sid)
+    if not department_id or session is None:
+        return
+    
+    # Only viewers of the department's faction receive its broadcasts
+    try:
+        context = await resolve_department_access(department_id)
+    except HTTPException as e:
+        await sio.emit('error', {'message': e.detail}, room=sid)
+        return
+    
+    if not Permissions.can_view_faction(session['role'], session['faction'], context.faction_code):
+        await sio.emit('error', {'message': "You don't have permission to view this department"}, room=sid)
+        return
+    
+    session['rooms'].add(department_id)
+    await sio.enter_room(sid, f"department_{department_id}")
+    logger.info(f"Client {sid} joined department {department_id}")
 
 @sio.event
 async def leave_department(sid, data):
     """Leave department room"""
     department_id = data.get('department_id')
-    if department_id:
+    session = sessions.get(sid)
+    if department_id and session is not None:
+        session['rooms'].discard(department_id)
         await sio.leave_room(sid, f"department_{department_id}")
         logger.info(f"Client {sid} left department {department_id}")
 
 # Broadcast functions
-async def broadcast_table_update(department_id: str, week_id: str, updated_by: str):
-    """Broadcast table update to all users in department"""
-    await sio.emit(
-        'table_updated',
-        {
-            'department_id': department_id,
-            'week_id': week_id,
-            'updated_by': updated_by
-        },
-        room=f"department_{department_id}"
-    )
-    logger.info(f"Broadcasted table update for department {department_id}")
+async def broadcast_table_update(
+    department_id: str,
+    week_id: str,
+    updated_by: str,
+    version: Optional[int] = None,
+    base_version: Optional[int] = None,
+    rows: Optional[List[dict]] = None,
+    operations: Optional[List[dict]] = None
+):
+    """Broadcast table update to all users in department.
+    
+    Carries the change itself (full `rows` and/or patch `operations`, applied
+    in that order) with the version it applies to (`base_version`) and the
+    resulting `version`, so viewers at base_version can apply it locally.
+    Anyone else reloads. Updates within SOCKET_COALESCE_WINDOW_MS are merged.
+    """
+    payload = {
+        'department_id': department_id,
+        'week_id': week_id,
+        'updated_by': updated_by,
+        'version': version,
+        'base_version': base_version
+    }
+    if rows is not None:
+        payload['rows'] = rows
+    if operations is not None:
+        payload['operations'] = operations
+    
+    await table_update_emitter.submit(f"department_{department_id}", payload)
+    logger.info(f"Queued table update for department {department_id} (version {version})")
 
 async def broadcast_structure_change(department_id: str, updated_by: str):
     """Broadcast table structure change"""
@@ -107,11 +271,26 @@ async def broadcast_structure_change(department_id: str, updated_by: str):
     logger.info(f"Broadcasted structure change for department {department_id}")
 
 async def send_notification(user_id: str, notification: dict):
-    """Send notification to specific user"""
-    if user_id in connections:
-        for sid in connections[user_id]:
-            await sio.emit('notification', notification, room=sid)
-        logger.info(f"Sent notification to user {user_id}")
+    """Send notification to specific user (on whichever worker they are connected)"""
+    await sio.emit('notification', notification, room=f"user_{user_id}")
+    logger.info(f"Sent notification to user {user_id}")
+
+async def send_notifications(notifications: List[dict]):
+    """Send a batch of notifications, each to its user_id, concurrently"""
+    await asyncio.gather(*(
+        sio.emit('notification', notification, room=f"user_{notification['user_id']}")
+        for notification in notifications
+    ))
+    logger.info(f"Sent {len(notifications)} notification(s)")
+
+async def send_unread_count(user_id: str, unread_count: int):
+    """Send the unread notification count to a user after notifications were read"""
+    await sio.emit('notifications_unread', {'unread_count': unread_count}, room=f"user_{user_id}")
+
+async def publish_control(method: str, data: dict):
+    """Send a control message to the other workers (no-op on a single-process server)"""
+    if hasattr(sio.manager, 'publish_control'):
+        await sio.manager.publish_control(method, data)
 
 async def broadcast_to_faction(faction_code: str, event: str, data: dict):
     """Broadcast event to all users in a faction"""
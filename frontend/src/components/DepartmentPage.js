@@ -1,8 +1,9 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import { useWebSocket } from '../contexts/WebSocketContext';
 import { api } from '../utils/api';
+import { applyTableDelta } from '../utils/tableDelta';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
 import { Input } from './ui/input';
@@ -23,6 +24,9 @@ export const DepartmentPage = () => {
   const [lectureTopics, setLectureTopics] = useState([]);
   const [trainingTopics, setTrainingTopics] = useState([]);
   const [tableData, setTableData] = useState({ rows: [] });
+  // Latest table for socket handlers, without re-subscribing on every change
+  const tableDataRef = useRef(tableData);
+  tableDataRef.current = tableData;
   const [loading, setLoading] = useState(true);
   const [saving, setSaving] = useState(false);
   const [hasChanges, setHasChanges] = useState(false);
@@ -61,9 +65,14 @@ export const DepartmentPage = () => {
                 onClick: () => loadData()
               }
             });
-            // Auto-reload if no unsaved changes
+            // Apply the change locally if no unsaved changes; reload only on a version gap
             if (!hasChanges) {
-              loadData();
+              const updated = applyTableDelta(tableDataRef.current, data);
+              if (updated) {
+                setTableData(updated);
+              } else {
+                loadData();
+              }
             }
           }
         };
@@ -252,12 +261,27 @@ export const DepartmentPage = () => {
         }))
       };
       
-      await api.put(`/api/weeks/${currentWeek.id}/table-data`, dataToSave);
+      // Conditional save: the server rejects it with 409 if someone saved in between
+      const result = await api.put(
+        `/api/weeks/${currentWeek.id}/table-data`,
+        dataToSave,
+        tableData.version !== undefined ? { 'If-Match': `"v${tableData.version}"` } : undefined
+      );
+      setTableData(prev => ({ ...prev, version: result.version }));
       toast.success('Таблица сохранена');
       setHasChanges(false);
     } catch (error) {
       console.error('Error saving:', error);
-      toast.error('Ошибка сохранения');
+      if (error.status === 409) {
+        toast.error('Таблицу уже изменил другой пользователь. Обновите данные и повторите изменения.', {
+          action: {
+            label: 'Обновить',
+            onClick: () => loadData()
+          }
+        });
+      } else {
+        toast.error('Ошибка сохранения');
+      }
     } finally {
       setSaving(false);
     }
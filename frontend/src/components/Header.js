@@ -1,5 +1,7 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { useAuth } from '../contexts/AuthContext';
+import { useWebSocket } from '../contexts/WebSocketContext';
+import { api } from '../utils/api';
 import { Button } from './ui/button';
 import { Moon, Sun, Bell, LogOut, User, Menu } from 'lucide-react';
 import { useTheme } from '../contexts/ThemeContext';
@@ -16,6 +18,26 @@ import { Badge } from './ui/badge';
 export const Header = ({ onMenuClick }) => {
   const { user, logout } = useAuth();
   const { theme, toggleTheme } = useTheme();
+  const { on, off } = useWebSocket();
+  const [unreadCount, setUnreadCount] = useState(0);
+
+  useEffect(() => {
+    if (!user) return;
+    api.get('/api/notifications/unread-count')
+      .then((data) => setUnreadCount(data.unread_count))
+      .catch(() => {});
+  }, [user]);
+
+  // The server pushes the new count with every notification and after reads
+  useEffect(() => {
+    const handleCount = (data) => setUnreadCount(data.unread_count);
+    on('notification', handleCount);
+    on('notifications_unread', handleCount);
+    return () => {
+      off('notification', handleCount);
+      off('notifications_unread', handleCount);
+    };
+  }, [on, off]);
 
   const getRoleLabel = (role) => {
     const roleMap = {
@@ -61,8 +83,13 @@ export const Header = ({ onMenuClick }) => {
             {theme === 'dark' ? <Sun className="h-5 w-5" /> : <Moon className="h-5 w-5" />}
           </Button>
 
-          <Button variant="ghost" size="icon" className="hidden sm:flex" data-testid="notifications-button">
+          <Button variant="ghost" size="icon" className="hidden sm:flex relative" data-testid="notifications-button">
             <Bell className="h-5 w-5" />
+            {unreadCount > 0 && (
+              <Badge className="absolute -top-1 -right-1 h-4 min-w-4 px-1 text-[10px]" data-testid="notifications-unread-badge">
+                {unreadCount > 99 ? '99+' : unreadCount}
+              </Badge>
+            )}
           </Button>
 
           <DropdownMenu>
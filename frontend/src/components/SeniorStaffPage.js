@@ -54,14 +54,27 @@ export const SeniorStaffPage = () => {
   const handleSave = async () => {
     setSaving(true);
     try {
-      await api.put(`/api/senior-staff/faction/${factionCode}`, {
-        rows: tableData.rows
-      });
+      // Conditional save: the server rejects it with 409 if someone saved in between
+      const result = await api.put(
+        `/api/senior-staff/faction/${factionCode}`,
+        { rows: tableData.rows },
+        tableData.version !== undefined ? { 'If-Match': `"v${tableData.version}"` } : undefined
+      );
+      setTableData(prev => ({ ...prev, version: result.version }));
       toast.success('Таблица сохранена');
       setHasChanges(false);
     } catch (error) {
       console.error('Error saving:', error);
-      toast.error('Ошибка сохранения');
+      if (error.status === 409) {
+        toast.error('Таблицу уже изменил другой пользователь. Обновите данные и повторите изменения.', {
+          action: {
+            label: 'Обновить',
+            onClick: () => loadData()
+          }
+        });
+      } else {
+        toast.error('Ошибка сохранения');
+      }
     } finally {
       setSaving(false);
     }
@@ -33,6 +33,8 @@ export const WebSocketProvider = ({ children }) => {
     
     const newSocket = io(wsUrl, {
       path: '/socket.io',
+      // The server verifies the access token at handshake; read it on every (re)connect
+      auth: (cb) => cb({ token: localStorage.getItem('access_token') }),
       transports: ['websocket', 'polling'],
       reconnection: true,
       reconnectionDelay: 1000,
@@ -43,12 +45,6 @@ export const WebSocketProvider = ({ children }) => {
     newSocket.on('connect', () => {
       console.log('WebSocket connected, socket id:', newSocket.id);
       setConnected(true);
-      
-      // Authenticate
-      newSocket.emit('authenticate', {
-        user_id: user.id,
-        faction: user.faction
-      });
     });
 
     newSocket.on('connect_error', (error) => {
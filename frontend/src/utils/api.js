@@ -35,7 +35,9 @@ export const apiCall = async (endpoint, options = {}) => {
         window.location.href = '/login';
       }
       const error = await response.json().catch(() => ({ detail: 'Request failed' }));
-      throw new Error(error.detail || `Request failed: ${response.status}`);
+      const apiError = new Error(error.detail || `Request failed: ${response.status}`);
+      apiError.status = response.status;
+      throw apiError;
     }
     
     return await response.json();
@@ -49,6 +51,6 @@ export const apiCall = async (endpoint, options = {}) => {
 export const api = {
   get: (endpoint) => apiCall(endpoint, { method: 'GET' }),
   post: (endpoint, data) => apiCall(endpoint, { method: 'POST', body: JSON.stringify(data) }),
-  put: (endpoint, data) => apiCall(endpoint, { method: 'PUT', body: JSON.stringify(data) }),
+  put: (endpoint, data, headers) => apiCall(endpoint, { method: 'PUT', body: JSON.stringify(data), headers }),
   delete: (endpoint) => apiCall(endpoint, { method: 'DELETE' })
 };
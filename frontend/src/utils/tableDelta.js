@@ -0,0 +1,44 @@
+// Apply a table_updated socket payload to locally loaded table data.
+// Returns the updated table, or null when the payload can't be applied
+// (different week, version gap, no delta) and the table must be reloaded.
+export const applyTableDelta = (table, payload) => {
+  if (!table || payload.version == null || payload.base_version == null) {
+    return null;
+  }
+  if (table.week_id !== payload.week_id || table.version !== payload.base_version) {
+    return null;
+  }
+
+  if (!payload.rows && !payload.operations) {
+    return null;
+  }
+
+  // Rows replace the table, then operations are applied on top (merged events can carry both)
+  let rows = payload.rows || table.rows;
+  for (const op of payload.operations || []) {
+    switch (op.op) {
+      case 'set_cell':
+        rows = rows.map(row => (
+          row.employee_name === op.employee_name
+            ? { ...row, cells: { ...row.cells, [op.column]: op.value } }
+            : row
+        ));
+        break;
+      case 'add_row':
+        rows = [...rows, op.row];
+        break;
+      case 'remove_row':
+        rows = rows.filter(row => row.employee_name !== op.employee_name);
+        break;
+      case 'rename_employee':
+        rows = rows.map(row => (
+          row.employee_name === op.employee_name ? { ...row, employee_name: op.new_name } : row
+        ));
+        break;
+      default:
+        return null;
+    }
+  }
+
+  return { ...table, rows, version: payload.version };
+};